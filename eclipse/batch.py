@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from state import BIG_SLOT, MOVE_MASK, MOVE_SHIFT, SLOTS_PER_SIDE
+from tables import DISTANCE
+
+DISTANCE_ARRAY = np.array(DISTANCE, dtype=np.float64)
+
+# Slots holding the pieces of each side, big stone included
+SIDE_SLOTS = [
+    np.arange(side * SLOTS_PER_SIDE, side * SLOTS_PER_SIDE + BIG_SLOT + 1)
+    for side in [0, 1]
+]
+
+
+def child_positions(state, moves):
+    # One row of piece cells per child position
+    moves = np.asarray(moves, dtype=np.int64)
+    children = np.tile(np.asarray(state.pos, dtype=np.int64), (len(moves), 1))
+    children[np.arange(len(moves)), moves >> MOVE_SHIFT] = moves & MOVE_MASK
+    return children
+
+
+def distance_features(children, player):
+    # The four terms of GameState.utility_distance per row of piece cells:
+    # the nearest six and all enemy pieces around the big stone of player,
+    # then the same around the enemy big stone. Sorted distances are
+    # accumulated left to right, so every term is summed in the same order as
+    # the scalar evaluation.
+    side = player - 1
+    big1 = children[:, side * SLOTS_PER_SIDE + BIG_SLOT]
+    big2 = children[:, (1 - side) * SLOTS_PER_SIDE + BIG_SLOT]
+
+    values1 = DISTANCE_ARRAY[big1[:, None], children[:, SIDE_SLOTS[1 - side]]]
+    values2 = DISTANCE_ARRAY[big2[:, None], children[:, SIDE_SLOTS[side]]]
+    values1 = np.cumsum(np.sort(values1, axis=1), axis=1)
+    values2 = np.cumsum(np.sort(values2, axis=1), axis=1)
+    return np.stack(
+        [values1[:, 5], values2[:, 5], values1[:, -1], values2[:, -1]], axis=1
+    )
+
+
+def utility_distance_batch(children, player, constants):
+    # Vectorised GameState.utility_distance over rows of piece cells
+    features = distance_features(children, player)
+    value = constants[0] * features[:, 0]
+    value -= constants[1] * features[:, 1]
+    value += constants[2] * features[:, 2]
+    value -= constants[3] * features[:, 3]
+    return value
+
+
+def evaluate_children(state, moves, player, constants):
+    # Scores of every child of a node for player, as a list of floats
+    if not moves:
+        return []
+    return utility_distance_batch(
+        child_positions(state, moves), player, constants
+    ).tolist()
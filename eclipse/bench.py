@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from batch import utility_distance_batch
+from engine import Engine
+from playout import PlayoutBatch
+from state import BIG_SLOT, LONG_CHAINS, MOVE_SHIFT, SHORT_CHAINS, GameState
+from tables import validate_crossing_table
+from tile import Tile
+
+# Fixed benchmark positions: name, layout and the moves played from the start,
+# with their perft node counts for depths 1 to 4
+POSITIONS = [
+    ("start", Tile.P_WHITE, []),
+    ("opening", Tile.P_WHITE, [294, 907, 479, 911, 603, 1367]),
+    ("early", Tile.P_BLACK, [203, 935, 143, 1374, 330, 1190, 457, 1313, 277, 805]),
+    (
+        "middle",
+        Tile.P_WHITE,
+        [416, 1418, 358, 1364, 536, 1301, 540, 1311, 231, 1425, 101, 1293]
+        + [297, 1304, 367, 1219],
+    ),
+    (
+        "late",
+        Tile.P_BLACK,
+        [395, 1368, 329, 1381, 599, 1126, 326, 1008, 9, 1187, 528, 1184, 2, 1244]
+        + [525, 1371, 402, 1238, 266, 1003, 256, 1055, 9, 1455],
+    ),
+    (
+        "trapped",
+        Tile.P_WHITE,
+        [422, 1361, 548, 777, 546, 1162, 37, 1094, 164, 1356, 609, 1233],
+    ),
+]
+PERFT = {
+    "start": [35, 1149, 39256, 1370834],
+    "opening": [44, 1735, 75708, 2982210],
+    "early": [47, 1726, 78423, 2978180],
+    "middle": [41, 1749, 73433, 3093360],
+    "late": [47, 2554, 116470, 6120175],
+    "trapped": [38, 1431, 55854, 2202832],
+}
+
+# Each throughput is measured for at least this many seconds
+MIN_TIME = 0.5
+
+# Random plies played from every position by the playout check, most of
+# these games end before so the winners are compared as well
+PLAYOUT_CHECK_PLIES = 400
+
+# A metric more than this fraction worse than the baseline is a regression
+THRESHOLD = 0.15
+
+
+def bench_positions():
+    positions = []
+    for name, down, moves in POSITIONS:
+        state = GameState(down=down)
+        for move in moves:
+            state.make_move(move)
+        positions.append((name, state))
+    return positions
+
+
+def perft(state, depth):
+    # Leaf nodes of the move tree, a won position has no moves
+    if depth == 0:
+        return 1
+    if state.find_winner():
+        return 0
+    nodes = 0
+    for move in state.get_next_moves():
+        state.make_move(move)
+        nodes += perft(state, depth - 1)
+        state.unmake_move()
+    return nodes
+
+
+def measure(function, min_time=MIN_TIME):
+    # Calls function until min_time has passed, function returns the number
+    # of operations it did. Returns operations per second.
+    count = 0
+    start = time.perf_counter()
+    while True:
+        count += function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return count / elapsed
+
+
+def bench_perft(positions, depth, verbose=True):
+    # Node counts against the expected ones and nodes per second
+    counts, failures = {}, []
+    nodes, start = 0, time.perf_counter()
+    for name, state in positions:
+        counts[name] = perft(state, depth)
+        nodes += counts[name]
+        expected = PERFT[name][depth - 1] if depth <= len(PERFT[name]) else None
+        if expected is not None and counts[name] != expected:
+            failures.append(name)
+        if verbose:
+            print(
+                "perft",
+                name,
+                depth,
+                counts[name],
+                "ok" if expected == counts[name] else ("FAIL" if expected else ""),
+            )
+    return counts, failures, nodes / (time.perf_counter() - start)
+
+
+def check_playouts(positions, plies=PLAYOUT_CHECK_PLIES, seed=0):
+    # The numpy playouts copy the move, pin and winner rules of GameState.
+    # Plays random playout steps from every position and compares the legal
+    # moves, the winner and the state after each step with GameState. Returns
+    # "name ply what" of every difference.
+    mismatches = []
+    rng = np.random.default_rng(seed)
+    for name, start in positions:
+        state = start.copy()
+        batch = PlayoutBatch(state, 1)
+        for ply in range(plies + 1):
+            where = name + " " + str(ply) + " "
+            moves = sorted(state.get_next_moves())
+            if batch.move_codes(0) != moves:
+                mismatches.append(where + "moves")
+                break
+            batch.update_winner()
+            if batch.winner[0] != (state.find_winner() or 0):
+                mismatches.append(where + "winner")
+                break
+            if batch.winner[0] or ply == plies:
+                break
+
+            # The row's move is the slot whose cell changed
+            before = batch.pos[0].copy()
+            batch.step(rng)
+            slots = np.flatnonzero(batch.pos[0] != before)
+            if len(slots) != 1:
+                mismatches.append(where + "step")
+                break
+            move = int(slots[0]) << MOVE_SHIFT | int(batch.pos[0, slots[0]])
+            if move not in moves:
+                mismatches.append(where + "step")
+                break
+            state.make_move(move)
+            if batch.pos[0].tolist() != list(state.pos):
+                mismatches.append(where + "step")
+                break
+    return mismatches
+
+
+def bench_movegen(positions, min_time=MIN_TIME):
+    states = [state for name, state in positions]
+    players = [(state, state.current_player) for state in states]
+    chains = SHORT_CHAINS + LONG_CHAINS + [BIG_SLOT >> 1]
+
+    def next_moves():
+        return sum(len(state.get_next_moves()) for state in states)
+
+    def moves_of_piece():
+        for state, player in players:
+            for stone_num in chains:
+                for move in state.find_moves_of_piece(player, stone_num):
+                    pass
+        return len(players) * len(chains)
+
+    def piece_blocked():
+        for state, player in players:
+            for stone_num in SHORT_CHAINS + LONG_CHAINS:
+                state.is_piece_blocked(player, stone_num)
+        return len(players) * 5
+
+    def winner():
+        for state in states:
+            state.find_winner()
+        return len(states)
+
+    return {
+        "movegen_moves_per_second": measure(next_moves, min_time),
+        "find_moves_of_piece_per_second": measure(moves_of_piece, min_time),
+        "is_piece_blocked_per_second": measure(piece_blocked, min_time),
+        "find_winner_per_second": measure(winner, min_time),
+    }
+
+
+def bench_eval(positions, min_time=MIN_TIME):
+    states = [state for name, state in positions]
+    constants = [1, 1, 0.1, 0.1]
+    rows = np.array([state.pos for state in states] * 64, dtype=np.intp)
+
+    def scalar():
+        for state in states:
+            state.utility_distance(Tile.P_WHITE, constants)
+        return len(states)
+
+    def batch():
+        utility_distance_batch(rows, Tile.P_WHITE, constants)
+        return len(rows)
+
+    return {
+        "utility_distance_per_second": measure(scalar, min_time),
+        "batch_eval_rows_per_second": measure(batch, min_time),
+    }
+
+
+def bench_search(positions, depth, verbose=True):
+    # Fixed depth searches from empty tables, without the solver so that the
+    # node counts only depend on the search
+    boards, elapsed, nodes = {}, 0.0, 0
+    for name, state in positions:
+        engine = Engine(ply_depth=depth, solver_moves=0)
+        start = time.perf_counter()
+        move, stats = engine.search(state, float("inf"))
+        seconds = time.perf_counter() - start
+        engine.close()
+        boards[name] = stats.boards
+        elapsed += seconds
+        nodes += stats.boards
+        if verbose:
+            print("search", name, depth, stats.boards, round(seconds, 3), "s")
+    return boards, {
+        "search_nodes_per_second": nodes / elapsed,
+        "time_to_depth_seconds": elapsed,
+    }
+
+
+def compare(metrics, baseline, threshold=THRESHOLD):
+    # (name, baseline, current, relative change) of every metric that got
+    # worse by more than threshold, times are better when lower
+    regressions = []
+    for name, value in metrics.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        change = value / old - 1
+        if name.endswith("_seconds"):
+            change = -change
+        if change < -threshold:
+            regressions.append((name, old, value, change))
+    return regressions
+
+
+def git_commit():
+    try:
+        output = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode().strip()
+
+
+def run_bench(perft_depth=3, search_depth=6, min_time=MIN_TIME, verbose=True):
+    positions = bench_positions()
+    crossing = validate_crossing_table()
+    playouts = check_playouts(positions)
+    counts, failures, perft_rate = bench_perft(positions, perft_depth, verbose)
+    boards, search = bench_search(positions, search_depth, verbose)
+
+    metrics = {"perft_nodes_per_second": perft_rate}
+    metrics.update(bench_movegen(positions, min_time))
+    metrics.update(bench_eval(positions, min_time))
+    metrics.update(search)
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "crossing_mismatches": len(crossing),
+        "perft_depth": perft_depth,
+        "perft": counts,
+        "perft_failures": failures,
+        "playout_mismatches": playouts,
+        "search_depth": search_depth,
+        "search_boards": boards,
+        "metrics": metrics,
+    }
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Check move generation and measure engine throughput."
+    )
+    parser.add_argument("--perft-depth", type=int, default=3)
+    parser.add_argument("--search-depth", type=int, default=6)
+    parser.add_argument("--min-time", type=float, default=MIN_TIME)
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON results of an earlier run")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    results = run_bench(args.perft_depth, args.search_depth, args.min_time)
+    print()
+    for name, value in results["metrics"].items():
+        print(name + ":", round(value, 3 if name.endswith("_seconds") else 1))
+
+    failed = False
+    if results["crossing_mismatches"]:
+        print("Crossing table mismatches:", results["crossing_mismatches"])
+        failed = True
+    if results["perft_failures"]:
+        print("Perft mismatches:", " ".join(results["perft_failures"]))
+        failed = True
+    if results["playout_mismatches"]:
+        print("Playout mismatches:", ", ".join(results["playout_mismatches"]))
+        failed = True
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if (
+            baseline.get("search_depth") == args.search_depth
+            and baseline.get("search_boards") != results["search_boards"]
+        ):
+            print("Search node counts differ from the baseline")
+        regressions = compare(results["metrics"], baseline["metrics"], args.threshold)
+        for name, old, new, change in regressions:
+            print(
+                "Regression:",
+                name,
+                round(old, 3),
+                "->",
+                round(new, 3),
+                "(" + str(round(100 * change, 1)) + "%)",
+            )
+        failed |= bool(regressions)
+
+    if args.out:
+        with open(args.out, "w") as file:
+            json.dump(results, file, indent=2)
+            file.write("\n")
+    sys.exit(1 if failed else 0)
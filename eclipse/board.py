@@ -68,6 +68,18 @@ class Board(tk.Tk):
             row=self.b_size_y + 3, column=0, columnspan=self.b_size_x + 3, sticky="ewns"
         )
 
+        # Create the button that makes the computer move at once
+        self.stop_button = tk.Button(
+            self,
+            text="Move now",
+            font=(None, 14),
+            state=tk.DISABLED,
+            command=lambda: self.stop_handler(),
+        )
+        self.stop_button.grid(
+            row=self.b_size_y + 4, column=0, columnspan=self.b_size_x + 3, sticky="ew"
+        )
+
         # Bind the drawing function and configure grid sizes
         self.canvas.bind("<Configure>", self.draw_tiles)
         self.columnconfigure(0, minsize=48)
@@ -81,6 +93,12 @@ class Board(tk.Tk):
     def add_click_handler(self, func):
         self.click_handler = func
 
+    def add_stop_handler(self, func):
+        self.stop_handler = func
+
+    def set_stop_enabled(self, enabled):
+        self.stop_button.configure(state=tk.NORMAL if enabled else tk.DISABLED)
+
     def set_status(self, text):
         self.status.configure(text=text)
 
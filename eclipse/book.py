@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import mmap
+import os
+import struct
+
+# A book file is a header followed by fixed size entries sorted by position
+# hash, so it can be searched in place without parsing:
+#   header  magic, format version, number of entries
+#   entry   position hash, move, search depth, score for the side to move
+HEADER = struct.Struct("<4sIQ")
+ENTRY = struct.Struct("<QHHf")
+MAGIC = b"ECLB"
+VERSION = 1
+
+DEFAULT_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+
+
+class OpeningBook:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError("not an opening book: " + str(path))
+        if len(self.data) != HEADER.size + self.count * ENTRY.size:
+            self.data.close()
+            raise ValueError("truncated opening book: " + str(path))
+
+    def close(self):
+        self.data.close()
+
+    def lookup(self, key):
+        # Binary search, returns (move, depth, score) or None
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = ENTRY.unpack_from(self.data, HEADER.size + mid * ENTRY.size)
+            if entry[0] < key:
+                lo = mid + 1
+            elif entry[0] > key:
+                hi = mid
+            else:
+                return entry[1:]
+        return None
+
+
+def open_book(path):
+    # The book is optional, a missing file means no book
+    return OpeningBook(path) if path and os.path.exists(path) else None
+
+
+def write_book(path, entries):
+    # entries maps position hash -> (move, depth, score), the file is
+    # replaced in one step so readers never see half of it
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(entries)))
+        for key in sorted(entries):
+            move, depth, score = entries[key]
+            file.write(ENTRY.pack(key, move, depth, score))
+    os.replace(temp_path, path)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+
+from batch import evaluate_children
+from book import DEFAULT_BOOK, write_book
+from engine import Engine
+from record import read_game_files
+from state import GameState
+from tile import Tile
+
+
+def candidate_moves(state, best_move, width, constants):
+    # The searched move and the next best moves by the evaluation
+    moves = state.get_next_moves()
+    scores = evaluate_children(state, moves, state.current_player, constants)
+    ranked = [move for score, move in sorted(zip(scores, moves), reverse=True)]
+    ranked.remove(best_move)
+    return [best_move] + ranked[: width - 1]
+
+
+def played_positions(games, plies):
+    # Positions after each of the first plies of recorded games, by layout
+    # and ply, one state per position
+    played = {}
+    for game in games:
+        down = Tile.P_BLACK if game.get("down") == Tile.P_BLACK else Tile.P_WHITE
+        layout = played.setdefault(down, [{} for ply in range(plies)])
+        state = GameState(down=down)
+        for ply, move in enumerate(game["moves"][:plies]):
+            layout[ply].setdefault(state.hash, state.copy())
+            state.make_move(move)
+    return played
+
+
+def generate_book(plies, depth, width, constants=None, verbose=True, games=None):
+    # Searches every position of the first plies to a fixed depth, following
+    # the best move and width - 1 alternatives at each, from both layouts.
+    # Positions of recorded games are added to the frontier as well.
+    engine = Engine(ply_depth=depth, constants=constants)
+    played = played_positions(games, plies) if games is not None else {}
+    entries = {}
+    for down in [Tile.P_WHITE, Tile.P_BLACK]:
+        frontier = [GameState(down=down)]
+        for ply in range(plies):
+            start = time.time()
+            if down in played:
+                frontier.extend(played[down][ply].values())
+            next_frontier = []
+            for state in frontier:
+                if state.hash in entries or state.find_winner():
+                    continue
+                # Every position starts from empty tables, so that its entry
+                # does not depend on the order of generation
+                engine.clear()
+                move, stats = engine.search(state, float("inf"))
+                value = stats.value if stats.value is not None else 0.0
+                entries[state.hash] = (move, stats.depth, value)
+                for reply in candidate_moves(state, move, width, engine.constants):
+                    child = state.copy()
+                    child.make_move(reply)
+                    next_frontier.append(child)
+            if verbose:
+                print(
+                    "down",
+                    "white" if down == Tile.P_WHITE else "black",
+                    "ply",
+                    ply + 1,
+                    "-",
+                    len(frontier),
+                    "positions,",
+                    round(time.time() - start, 2),
+                    "s",
+                )
+            frontier = next_frontier
+    return entries
+
+
+if __name__ == "__main__":
+
+    # Catch missing parameters
+    if len(sys.argv) < 3 or not all(arg.isdigit() for arg in sys.argv[1:4]):
+        print("usage: bookgen.py <plies> <depth> [<width>] [<path>] [<games-file> ...]")
+        sys.exit(-1)
+
+    plies, depth = int(sys.argv[1]), int(sys.argv[2])
+    width = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    path = sys.argv[4] if len(sys.argv) > 4 else DEFAULT_BOOK
+
+    games = read_game_files(sys.argv[5:]) if len(sys.argv) > 5 else None
+    entries = generate_book(plies, depth, width, games=games)
+    write_book(path, entries)
+    print("Wrote", len(entries), "positions to", path)
@@ -0,0 +1,684 @@
+# -*- coding: utf-8 -*-
+import time
+
+from batch import evaluate_children
+from book import open_book
+from solver import MateSolver
+from state import MOVE_SHIFT
+from tile import Tile
+from ttable import EXACT, LOWER, UPPER, TranspositionTable
+from weights import load_weights
+
+MAX_PLY = 128
+ALGORITHMS = ["pvs", "minimax"]
+
+# Width of the zero window used to test moves after the first one
+NULL_WINDOW = 1e-4
+
+# Aspiration windows wider than this fall back to an open bound
+ASPIRATION_LIMIT = 64.0
+
+# Reductions only apply from this remaining depth on, null moves only while
+# the big stone of the side to move has this many steps
+LMR_MIN_DEPTH = 3
+NULL_MOVE_MIN_MOBILITY = 3
+
+# Frontier nodes search this many moves one by one before batching the rest
+BATCH_AFTER = 2
+
+# The mate solver runs first when the enemy big stone has at most this many
+# steps, with this share of the turn time
+SOLVER_MOBILITY = 2
+SOLVER_SHARE = 0.25
+
+# Cutoffs are counted by the index of the move that caused them, the last
+# entry counts all later moves
+CUTOFF_MOVES = 8
+
+
+# SearchStats fields that add up across searches
+COUNTERS = [
+    "boards",
+    "prunes",
+    "tt_probes",
+    "tt_hits",
+    "tt_cutoffs",
+    "researches",
+    "aspiration_fails",
+    "lmr_reductions",
+    "lmr_researches",
+    "null_cutoffs",
+    "null_verify_fails",
+    "batches",
+    "playouts",
+]
+
+
+class SearchStats:
+    def __init__(self):
+        self.value = None
+        self.depth = 0
+        self.boards = 0
+        self.prunes = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.time = 0.0
+
+        # (depth, time, boards, prunes, value) per completed iteration
+        self.iterations = []
+
+        # Principal variation search re-searches and aspiration failures
+        self.researches = 0
+        self.aspiration_fails = 0
+
+        # Reduced moves, reductions undone, verified null move cutoffs and
+        # null moves refuted by their verification search
+        self.lmr_reductions = 0
+        self.lmr_researches = 0
+        self.null_cutoffs = 0
+        self.null_verify_fails = 0
+
+        # Frontier nodes scored through the batch evaluator
+        self.batches = 0
+
+        # Monte Carlo playouts and the visits already in a reused tree, and
+        # (worker, playouts, playouts per second) of a root parallel search
+        self.playouts = 0
+        self.reused = 0
+        self.workers = []
+
+        # The move came from the opening book, or is a forced win in this
+        # many moves found by the mate solver
+        self.book = False
+        self.mate = 0
+
+        # Beta cutoffs by the index of the cutting move in the ordered moves
+        self.cutoff_moves = [0] * CUTOFF_MOVES
+
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    def playouts_per_second(self):
+        return self.playouts / self.time if self.time else 0.0
+
+    def merge(self, other):
+        # Add the node counters of a search done elsewhere, e.g. in a worker
+        for name in COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for i, count in enumerate(other.cutoff_moves):
+            self.cutoff_moves[i] += count
+
+
+class Engine:
+    def __init__(
+        self,
+        ply_depth=64,
+        ab_enabled=True,
+        constants=None,
+        tt_size_mb=16,
+        ordering=True,
+        algorithm="pvs",
+        aspiration=2.0,
+        lmr_moves=3,
+        null_move_r=2,
+        batch_eval=True,
+        book=None,
+        solver_moves=2,
+        weights=None,
+    ):
+        self.options = dict(
+            ply_depth=ply_depth,
+            ab_enabled=ab_enabled,
+            constants=constants,
+            tt_size_mb=tt_size_mb,
+            ordering=ordering,
+            algorithm=algorithm,
+            aspiration=aspiration,
+            lmr_moves=lmr_moves,
+            null_move_r=null_move_r,
+            batch_eval=batch_eval,
+            book=book,
+            solver_moves=solver_moves,
+            weights=weights,
+        )
+
+        # Iterative deepening stops at ply_depth or when time runs short
+        self.ply_depth = ply_depth
+        self.max_growth = 12.0
+        self.ab_enabled = ab_enabled
+
+        # Evaluation weights: the given constants, else those of the weights
+        # file written by the tuner, else the hand picked ones
+        if constants is None:
+            constants = load_weights(weights)
+        self.constants = constants if constants is not None else [1, 1, 0.1, 0.1]
+
+        # The table is kept between searches and turns
+        self.tt = TranspositionTable(tt_size_mb) if tt_size_mb else None
+        self.timed_out = False
+        self.stopped = False
+
+        # Read by other threads while a search runs
+        self.stats = SearchStats()
+        self.best_move = None
+
+        # Move ordering: hash move, two killer moves per ply, then history
+        self.ordering = ordering
+        self.killers = [[None, None] for ply in range(MAX_PLY)]
+        self.history = [0] * (24 << MOVE_SHIFT)
+
+        # "pvs" runs a negamax principal variation search inside aspiration
+        # windows of the given half width, "minimax" the plain alpha-beta
+        if algorithm not in ALGORITHMS:
+            raise ValueError("unknown search algorithm: " + str(algorithm))
+        if algorithm == "pvs" and not ab_enabled:
+            raise ValueError("pvs always prunes, use minimax without alpha-beta")
+        self.algorithm = algorithm
+        self.aspiration = aspiration
+
+        # Late move reductions start after lmr_moves moves and null moves
+        # reduce by null_move_r plies, 0 turns either off (pvs only)
+        self.lmr_moves = lmr_moves
+        self.null_move_r = null_move_r
+        self.null_move_depth = null_move_r + 1
+
+        # Score the children of depth 1 nodes with the numpy evaluator
+        self.batch_eval = batch_eval
+        self.root_player = None
+        self.last_score = None
+
+        # Positions of the opening book file are answered without a search
+        self.book = open_book(book)
+
+        # Forced wins of up to solver_moves own moves are played at once,
+        # 0 turns the solver off
+        self.solver_moves = solver_moves
+
+    def stop(self):
+        # Ends a running search as if its time was up, may be called from
+        # another thread
+        self.stopped = True
+
+    def progress(self):
+        # (depth completed, boards, best move so far) of the running search
+        return self.stats.depth, self.stats.boards, self.best_move
+
+    def out_of_time(self, max_time):
+        return self.stopped or time.time() > max_time
+
+    def order_moves(self, moves, tt_move, ply):
+        moves.sort(key=self.history.__getitem__, reverse=True)
+        for move in self.killers[ply][::-1] + [tt_move]:
+            if move is not None and move in moves:
+                moves.remove(move)
+                moves.insert(0, move)
+        return moves
+
+    def record_cutoff(self, move, depth, ply):
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history[move] += depth * depth
+
+    def minimax(
+        self,
+        state,
+        depth,
+        player_to_max,
+        max_time,
+        stats,
+        a=float("-inf"),
+        b=float("inf"),
+        maxing=True,
+        root=False,
+        ply=0,
+    ):
+
+        # Bottomed out base case
+        if depth == 0 or state.find_winner():
+            return state.utility_distance(player_to_max, self.constants), None
+        if self.out_of_time(max_time):
+            self.timed_out = True
+            return state.utility_distance(player_to_max, self.constants), None
+
+        # The table holds scores for the side to move at the node
+        a_orig, b_orig = a, b
+        tt_move = None
+        if self.tt is not None:
+            stats.tt_probes += 1
+            entry = self.tt.probe(state.hash)
+            if entry is not None:
+                stats.tt_hits += 1
+                tt_move, tt_depth, tt_bound, tt_score = entry
+                tt_val = tt_score if maxing else -tt_score
+                if (
+                    not root
+                    and tt_depth >= depth
+                    and (
+                        tt_bound == EXACT
+                        or (
+                            tt_bound == LOWER
+                            and (tt_val >= b if maxing else tt_val <= a)
+                        )
+                        or (
+                            tt_bound == UPPER
+                            and (tt_val <= a if maxing else tt_val >= b)
+                        )
+                    )
+                ):
+                    stats.tt_cutoffs += 1
+                    return tt_val, tt_move
+
+        # Setup initial variables and find moves
+        best_move = None
+        if maxing:
+            best_val = float("-inf")
+            moves = state.get_next_moves(player_to_max)
+        else:
+            best_val = float("inf")
+            moves = state.get_next_moves(
+                (Tile.P_WHITE if player_to_max == Tile.P_BLACK else Tile.P_BLACK)
+            )
+        if self.ordering:
+            self.order_moves(moves, tt_move, ply)
+
+        # At frontier nodes the first moves often cut off on their own, the
+        # remaining children are scored together in one batch
+        frontier = None
+
+        # For each move
+        for i, move in enumerate(moves):
+            if i == BATCH_AFTER and depth == 1 and self.batch_eval:
+                frontier = self.evaluate_frontier(
+                    state, moves[BATCH_AFTER:], stats, player_to_max
+                )
+            if frontier is not None:
+                val = frontier[i - BATCH_AFTER]
+            else:
+                # Bail out when we're out of time
+                if self.out_of_time(max_time):
+                    self.timed_out = True
+                    return best_val, best_move
+
+                # Play the move in place
+                state.make_move(move)
+                stats.boards += 1
+
+                # Recursively call self
+                val, _ = self.minimax(
+                    state,
+                    depth - 1,
+                    player_to_max,
+                    max_time,
+                    stats,
+                    a,
+                    b,
+                    not maxing,
+                    ply=ply + 1,
+                )
+
+                # Take the move back
+                state.unmake_move()
+
+            if maxing and val > best_val:
+                best_val = val
+                best_move = move
+                a = max(a, val)
+
+            if not maxing and val < best_val:
+                best_val = val
+                best_move = move
+                b = min(b, val)
+
+            if self.ab_enabled and b <= a:
+                stats.prunes += 1
+                stats.cutoff_moves[min(i, CUTOFF_MOVES - 1)] += 1
+                if self.ordering:
+                    self.record_cutoff(move, depth, ply)
+                break
+
+        # Results of an interrupted search are not trusted
+        if self.tt is not None and not self.timed_out:
+            if maxing:
+                tt_score, tt_a, tt_b = best_val, a_orig, b_orig
+            else:
+                tt_score, tt_a, tt_b = -best_val, -b_orig, -a_orig
+            if tt_score <= tt_a:
+                bound = UPPER
+            elif tt_score >= tt_b:
+                bound = LOWER
+            else:
+                bound = EXACT
+            self.tt.store(state.hash, best_move, depth, bound, tt_score)
+
+        return best_val, best_move
+
+    def evaluate_frontier(self, state, moves, stats, player=None):
+        # Scores of all children for player (the root player by default)
+        stats.boards += len(moves)
+        stats.batches += 1
+        return evaluate_children(
+            state, moves, player or self.root_player, self.constants
+        )
+
+    def evaluate(self, state):
+        # Leaf score for the side to move, always measured for the root player
+        # so that the result matches minimax for any set of constants
+        val = state.utility_distance(self.root_player, self.constants)
+        return val if state.current_player == self.root_player else -val
+
+    def pvs(
+        self,
+        state,
+        depth,
+        alpha,
+        beta,
+        max_time,
+        stats,
+        root=False,
+        ply=0,
+        allow_null=True,
+    ):
+
+        # Bottomed out base case
+        if depth <= 0 or state.find_winner():
+            return self.evaluate(state), None
+        if self.out_of_time(max_time):
+            self.timed_out = True
+            return self.evaluate(state), None
+
+        alpha_orig = alpha
+        tt_move = None
+        if self.tt is not None:
+            stats.tt_probes += 1
+            entry = self.tt.probe(state.hash)
+            if entry is not None:
+                stats.tt_hits += 1
+                tt_move, tt_depth, tt_bound, tt_score = entry
+                if (
+                    not root
+                    and tt_depth >= depth
+                    and (
+                        tt_bound == EXACT
+                        or (tt_bound == LOWER and tt_score >= beta)
+                        or (tt_bound == UPPER and tt_score <= alpha)
+                    )
+                ):
+                    stats.tt_cutoffs += 1
+                    return tt_score, tt_move
+
+        # Null move: if passing still holds beta, a real move will too. Passing
+        # is not a legal move in Eclipse, so it is skipped on the principal
+        # variation and when the own big stone is short of room, where being
+        # forced to move can hurt, and a fail high is confirmed by a reduced
+        # search without null moves.
+        pv_node = beta - alpha > 2 * NULL_WINDOW
+        if (
+            self.null_move_r
+            and allow_null
+            and not pv_node
+            and depth >= self.null_move_depth
+            and self.evaluate(state) >= beta
+            and state.big_mobility(state.current_player) >= NULL_MOVE_MIN_MOBILITY
+        ):
+            r = self.null_move_r
+            state.make_null_move()
+            val = -self.pvs(
+                state,
+                depth - 1 - r,
+                -beta,
+                -beta + NULL_WINDOW,
+                max_time,
+                stats,
+                ply=ply + 1,
+                allow_null=False,
+            )[0]
+            state.unmake_null_move()
+            if val >= beta and not self.timed_out:
+                val = self.pvs(
+                    state,
+                    depth - r,
+                    beta - NULL_WINDOW,
+                    beta,
+                    max_time,
+                    stats,
+                    ply=ply,
+                    allow_null=False,
+                )[0]
+                if val >= beta:
+                    stats.null_cutoffs += 1
+                    return val, None
+                stats.null_verify_fails += 1
+
+        moves = state.get_next_moves()
+        if self.ordering:
+            self.order_moves(moves, tt_move, ply)
+
+        # At frontier nodes the first moves often cut off on their own, the
+        # remaining children are scored together in one batch
+        frontier = None
+        best_val, best_move = float("-inf"), None
+        for i, move in enumerate(moves):
+            if i == BATCH_AFTER and depth == 1 and self.batch_eval:
+                frontier = self.evaluate_frontier(state, moves[BATCH_AFTER:], stats)
+                if state.current_player == self.root_player:
+                    frontier = [-val for val in frontier]
+            if frontier is not None:
+                val = -frontier[i - BATCH_AFTER]
+                if val > best_val:
+                    best_val, best_move = val, move
+                    if val > alpha:
+                        alpha = val
+                if alpha >= beta:
+                    stats.prunes += 1
+                    stats.cutoff_moves[min(i, CUTOFF_MOVES - 1)] += 1
+                    if self.ordering:
+                        self.record_cutoff(move, depth, ply)
+                    break
+                continue
+
+            if self.out_of_time(max_time):
+                self.timed_out = True
+                return best_val, best_move
+
+            state.make_move(move)
+            stats.boards += 1
+
+            # The first move gets the full window, the rest only have to show
+            # they are no better and are searched again when they are. Late
+            # moves are first tried at reduced depth and verified at full
+            # depth when they beat alpha.
+            if i == 0:
+                val = -self.pvs(
+                    state, depth - 1, -beta, -alpha, max_time, stats, ply=ply + 1
+                )[0]
+            else:
+                r = 0
+                if self.lmr_moves and i >= self.lmr_moves and depth >= LMR_MIN_DEPTH:
+                    r = 2 if i >= 3 * self.lmr_moves and depth > 4 else 1
+                    stats.lmr_reductions += 1
+                val = -self.pvs(
+                    state,
+                    depth - 1 - r,
+                    -alpha - NULL_WINDOW,
+                    -alpha,
+                    max_time,
+                    stats,
+                    ply=ply + 1,
+                )[0]
+                if r and val > alpha and not self.timed_out:
+                    stats.lmr_researches += 1
+                    val = -self.pvs(
+                        state,
+                        depth - 1,
+                        -alpha - NULL_WINDOW,
+                        -alpha,
+                        max_time,
+                        stats,
+                        ply=ply + 1,
+                    )[0]
+                if alpha < val < beta and not self.timed_out:
+                    stats.researches += 1
+                    val = -self.pvs(
+                        state, depth - 1, -beta, -alpha, max_time, stats, ply=ply + 1
+                    )[0]
+
+            state.unmake_move()
+
+            if val > best_val:
+                best_val, best_move = val, move
+                if val > alpha:
+                    alpha = val
+            if alpha >= beta:
+                stats.prunes += 1
+                stats.cutoff_moves[min(i, CUTOFF_MOVES - 1)] += 1
+                if self.ordering:
+                    self.record_cutoff(move, depth, ply)
+                break
+
+        # Results of an interrupted search are not trusted
+        if self.tt is not None and not self.timed_out:
+            if best_val <= alpha_orig:
+                bound = UPPER
+            elif best_val >= beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+            self.tt.store(state.hash, best_move, depth, bound, best_val)
+
+        return best_val, best_move
+
+    def aspiration_search(self, state, depth, guess, max_time, stats):
+        # Search a window around the expected score and widen the failing side
+        if guess is None or not self.aspiration:
+            return self.pvs(
+                state, depth, float("-inf"), float("inf"), max_time, stats, root=True
+            )
+
+        width = self.aspiration
+        alpha, beta = guess - width, guess + width
+        while True:
+            val, move = self.pvs(state, depth, alpha, beta, max_time, stats, root=True)
+            if self.timed_out or alpha < val < beta:
+                return val, move
+
+            stats.aspiration_fails += 1
+            width *= 4
+            if val <= alpha:
+                alpha = val - width if width < ASPIRATION_LIMIT else float("-inf")
+            else:
+                beta = val + width if width < ASPIRATION_LIMIT else float("inf")
+
+    def search_root(self, state, depth, guess, max_time, stats):
+        # One iteration of the deepening loop
+        if self.algorithm == "pvs":
+            return self.aspiration_search(state, depth, guess, max_time, stats)
+        return self.minimax(
+            state, depth, state.current_player, max_time, stats, root=True
+        )
+
+    def clear(self):
+        # Forget what earlier searches learned, the next search only depends
+        # on its position
+        if self.tt is not None:
+            self.tt.clear()
+        self.history = [0] * (24 << MOVE_SHIFT)
+        self.root_player = None
+        self.last_score = None
+
+    def close(self):
+        # Release resources held between searches
+        if self.book is not None:
+            self.book.close()
+            self.book = None
+
+    def search(self, state, time_limit):
+        stats = self.stats = SearchStats()
+        self.best_move = None
+        start = time.time()
+        max_time = start + time_limit
+        self.timed_out = False
+        self.stopped = False
+        if self.tt is not None:
+            self.tt.new_search()
+        self.killers = [[None, None] for ply in range(MAX_PLY)]
+        self.history = [value >> 2 for value in self.history]
+
+        # Search a private copy, the caller's position is left untouched
+        state = state.copy()
+        moves = state.get_next_moves()
+        if len(moves) <= 1:
+            stats.time = time.time() - start
+            return (moves[0] if moves else None), stats
+
+        # A book move is trusted when it is legal here, which also guards
+        # against hash collisions
+        entry = self.book.lookup(state.hash) if self.book is not None else None
+        if entry is not None and entry[0] in moves:
+            stats.book = True
+            stats.depth = entry[1]
+            stats.value = entry[2]
+            stats.time = time.time() - start
+            return entry[0], stats
+
+        # Look for a forced win when the enemy big stone is short of room
+        enemy = 3 - state.current_player
+        if self.solver_moves and state.big_mobility(enemy) <= SOLVER_MOBILITY:
+            result = MateSolver().solve(
+                state, self.solver_moves, time_limit * SOLVER_SHARE
+            )
+            if result is not None:
+                stats.mate = result[1]
+                stats.depth = 2 * result[1] - 1
+                stats.time = time.time() - start
+                return result[0], stats
+
+        # Iterative deepening, only completed iterations are trusted. Scores
+        # swing between odd and even depths, so aspiration windows are centred
+        # on the score two plies shallower, or on the last turn's score.
+        if self.root_player != state.current_player:
+            self.last_score = None
+        self.root_player = state.current_player
+        best_move, best_val = moves[0], None
+        scores = {}
+        last_time = prev_time = None
+        for depth in range(1, self.ply_depth + 1):
+            iter_start = time.time()
+            boards, prunes = stats.boards, stats.prunes
+            guess = scores.get(depth - 2, self.last_score)
+            val, move = self.search_root(state, depth, guess, max_time, stats)
+            iter_time = time.time() - iter_start
+            if self.timed_out:
+                break
+
+            if move is not None:
+                best_move, best_val = move, val
+                self.best_move = best_move
+            scores[depth] = val
+            stats.depth = depth
+            stats.iterations.append(
+                (depth, iter_time, stats.boards - boards, stats.prunes - prunes, val)
+            )
+
+            # Skip the next depth when it is unlikely to finish in time
+            prev_time, last_time = last_time, iter_time
+            if depth < self.ply_depth and not self.next_depth_fits(
+                prev_time, last_time, max_time - time.time()
+            ):
+                break
+
+        stats.value = best_val
+        stats.time = time.time() - start
+        if best_val is not None:
+            self.last_score = best_val
+        return best_move, stats
+
+    def next_depth_fits(self, prev_time, last_time, time_left):
+        # Predict the next iteration from the growth of the last two
+        if prev_time and prev_time > 0.001:
+            growth = min(max(last_time / prev_time, 2.0), self.max_growth)
+        else:
+            growth = self.max_growth
+        return last_time * growth < time_left
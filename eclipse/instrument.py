@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+import functools
+import json
+import sys
+import time
+
+import engine
+from engine import Engine
+from state import GameState
+
+# Hot path functions that are counted and timed: (owner, attribute, phase).
+# Times include the functions they call, so movegen contains moves_of_piece
+# and that contains is_piece_blocked. Crossing tests are table lookups inside
+# these, line_intersect only builds the tables.
+TIMED = [
+    (GameState, "get_next_moves", "movegen"),
+    (GameState, "find_moves_of_piece", "moves_of_piece"),
+    (GameState, "is_piece_blocked", "is_piece_blocked"),
+    (GameState, "find_winner", "find_winner"),
+    (GameState, "make_move", "make_move"),
+    (GameState, "unmake_move", "unmake_move"),
+    (GameState, "utility_distance", "evaluate"),
+    (engine, "evaluate_children", "batch_evaluate"),
+]
+
+# Search functions whose calls are counted by ply, for the branching factor
+# of the last root search. A child is counted once however often it is
+# searched again, children scored together by evaluate_frontier count on the
+# ply below.
+NODES = [(Engine, "pvs"), (Engine, "minimax")]
+
+
+class Instrument:
+    def __init__(self, trace=None):
+
+        # Calls and seconds per phase, nodes per ply and rows scored by the
+        # batch evaluator, all since the last reset
+        self.calls = {}
+        self.seconds = {}
+        self.nodes = []
+        self.rows = 0
+        self.reset()
+
+        # (ply, node, history length) of the search calls in progress, and
+        # the node numbers of the children counted since the last root call
+        self.frames = []
+        self.children = {}
+
+        # Snapshot of the last traced search
+        self.last = None
+
+        # Original functions while enabled, nothing is wrapped otherwise so
+        # a disabled instrument costs nothing
+        self.originals = []
+        self.trace = open(trace, "a") if trace else None
+
+    def reset(self):
+        for owner, attribute, phase in TIMED:
+            self.calls[phase] = 0
+            self.seconds[phase] = 0.0
+        del self.nodes[:]
+        self.rows = 0
+        self.children = {}
+
+    def enable(self):
+        if self.originals:
+            return
+        for owner, attribute, phase in TIMED:
+            self.patch(owner, attribute, self.timed(phase, getattr(owner, attribute)))
+        for owner, attribute in NODES:
+            self.patch(owner, attribute, self.counted(getattr(owner, attribute)))
+        self.patch(Engine, "evaluate_frontier", self.frontier(Engine.evaluate_frontier))
+        self.patch(Engine, "search", self.traced(Engine.search))
+
+    def disable(self):
+        for owner, attribute, function in reversed(self.originals):
+            setattr(owner, attribute, function)
+        self.originals = []
+
+    def close(self):
+        self.disable()
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+
+    def patch(self, owner, attribute, wrapper):
+        self.originals.append((owner, attribute, getattr(owner, attribute)))
+        setattr(owner, attribute, wrapper)
+
+    def timed(self, phase, function):
+        calls, seconds, clock = self.calls, self.seconds, time.perf_counter
+        generator = phase == "moves_of_piece"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            result = function(*args, **kwargs)
+            if generator:
+                result = list(result)
+            seconds[phase] += clock() - start
+            calls[phase] += 1
+            return result
+
+        if phase == "batch_evaluate":
+
+            @functools.wraps(function)
+            def batch_wrapper(state, moves, *args, **kwargs):
+                self.rows += len(moves)
+                return wrapper(state, moves, *args, **kwargs)
+
+            return batch_wrapper
+        return wrapper
+
+    def count_nodes(self, ply, count):
+        while len(self.nodes) <= ply:
+            self.nodes.append(0)
+        self.nodes[ply] += count
+
+    def count_child(self, ply, parent, move):
+        # Node number of the child of parent reached by move (None for a null
+        # move), counted the first time it is searched
+        key = (parent, move)
+        if key not in self.children:
+            self.children[key] = len(self.children) + 1
+            self.count_nodes(ply, 1)
+        return self.children[key]
+
+    def counted(self, function):
+        frames = self.frames
+
+        @functools.wraps(function)
+        def wrapper(searcher, state, *args, **kwargs):
+            # Every root call starts the counts again, so an iteration and
+            # an aspiration re-search count the last search only. A null move
+            # verification search re-enters the node it came from at the same
+            # ply, and PVS and LMR re-searches reach children seen before.
+            ply = kwargs.get("ply", 0)
+            history = len(state.history)
+            if not frames:
+                del self.nodes[:]
+                self.children.clear()
+                self.count_nodes(ply, 1)
+                frame = (ply, 0, history)
+            elif frames[-1][0] == ply:
+                frame = frames[-1]
+            else:
+                parent, parent_history = frames[-1][1:]
+                move = state.history[-1] if history > parent_history else None
+                frame = (ply, self.count_child(ply, parent, move), history)
+            frames.append(frame)
+            try:
+                return function(searcher, state, *args, **kwargs)
+            finally:
+                frames.pop()
+
+        return wrapper
+
+    def frontier(self, function):
+        frames = self.frames
+
+        @functools.wraps(function)
+        def wrapper(searcher, state, moves, *args, **kwargs):
+            ply, parent = frames[-1][:2] if frames else (0, 0)
+            for move in moves:
+                self.count_child(ply + 1, parent, move)
+            return function(searcher, state, moves, *args, **kwargs)
+
+        return wrapper
+
+    def traced(self, function):
+        # Every search starts from zero and is written to the trace
+        @functools.wraps(function)
+        def wrapper(searcher, state, time_limit):
+            self.reset()
+            move, stats = function(searcher, state, time_limit)
+            self.record(stats, move, state)
+            return move, stats
+
+        return wrapper
+
+    def branching(self):
+        # Nodes searched per node of the ply above
+        return [
+            self.nodes[ply + 1] / self.nodes[ply]
+            for ply in range(len(self.nodes) - 1)
+            if self.nodes[ply]
+        ]
+
+    def snapshot(self, stats=None):
+        # Phase counters since the last reset, with the search stats of the
+        # search that produced them
+        result = {
+            "calls": dict(self.calls),
+            "seconds": {phase: round(t, 6) for phase, t in self.seconds.items()},
+            "batch_rows": self.rows,
+            "nodes_by_ply": list(self.nodes),
+            "branching": [round(b, 3) for b in self.branching()],
+        }
+        if stats is not None:
+            iterations = stats.iterations
+            result.update(
+                depth=stats.depth,
+                time=stats.time,
+                boards=stats.boards,
+                prunes=stats.prunes,
+                cutoff_moves=list(stats.cutoff_moves),
+                tt_hit_rate=stats.tt_hit_rate(),
+                iteration_boards=[boards for d, t, boards, p, v in iterations],
+                iteration_branching=[
+                    round(iterations[i][2] / iterations[i - 1][2], 3)
+                    for i in range(1, len(iterations))
+                    if iterations[i - 1][2]
+                ],
+            )
+        return result
+
+    def record(self, stats, move=None, state=None):
+        self.last = self.snapshot(stats)
+        if self.trace is not None:
+            line = dict(self.last, move=move)
+            if state is not None:
+                line["ply"] = state.total_plies
+            self.trace.write(json.dumps(line) + "\n")
+            self.trace.flush()
+
+    def report(self, out=sys.stdout):
+        # Phase table of the last search, slowest first
+        last = self.last
+        if last is None:
+            return
+        print("Phase            calls      seconds   us/call", file=out)
+        for phase, seconds in sorted(
+            last["seconds"].items(), key=lambda item: item[1], reverse=True
+        ):
+            calls = last["calls"][phase]
+            print(
+                "  %-14s %8d %10.4f %9.2f"
+                % (phase, calls, seconds, 1e6 * seconds / calls if calls else 0.0),
+                file=out,
+            )
+        print("Nodes by ply (last search):", last["nodes_by_ply"], file=out)
+        print("Branching factor:", last["branching"], file=out)
+        if "cutoff_moves" in last:
+            total = sum(last["cutoff_moves"]) or 1
+            print(
+                "Cutoffs by move:",
+                " ".join(
+                    str(round(100 * count / total, 1)) + "%"
+                    for count in last["cutoff_moves"]
+                ),
+                file=out,
+            )
+
+
+if __name__ == "__main__":
+
+    # Catch missing parameters
+    if len(sys.argv) < 2 or not sys.argv[1].isdigit():
+        print("usage: instrument.py <depth> [<trace-file>]")
+        sys.exit(-1)
+
+    from bench import bench_positions
+
+    depth = int(sys.argv[1])
+    instrument = Instrument(sys.argv[2] if len(sys.argv) > 2 else None)
+    instrument.enable()
+    for name, state in bench_positions():
+        search_engine = Engine(ply_depth=depth, solver_moves=0)
+        move, stats = search_engine.search(state, float("inf"))
+        search_engine.close()
+        print()
+        print(name, "- depth", stats.depth, "-", stats.boards, "boards,", end=" ")
+        print(round(stats.time, 3), "s")
+        instrument.report()
+    instrument.close()
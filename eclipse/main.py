@@ -6,18 +6,21 @@ from tile import Tile
 
 WHITE_OPTIONS = ["w", "white"]
 BLACK_OPTIONS = ["b", "black"]
+ENGINE_OPTIONS = ["alphabeta", "mcts"]
 
 # Process and pass along command line parameters
 if __name__ == "__main__":
 
     # Catch missing parameters
     if len(sys.argv) < 3:
-        print("usage: main.py <t-limit> [<h-player>]")
+        print("usage: main.py <t-limit> [<h-player>] [<engine>] [<trace-file>]")
         sys.exit(-1)
 
     # Unpack params into variables
     t_limit = sys.argv[1]
-    h_player = sys.argv[2] if len(sys.argv) == 3 else None
+    h_player = sys.argv[2] if len(sys.argv) >= 3 else None
+    engine = sys.argv[3].lower() if len(sys.argv) >= 4 else ENGINE_OPTIONS[0]
+    trace = sys.argv[4] if len(sys.argv) >= 5 else None
 
     # Validate b_size and t_limit
     if not t_limit.isdigit():
@@ -45,4 +48,9 @@ if __name__ == "__main__":
             )
             sys.exit(-1)
 
-    elcipse = Eclipse(t_limit, c_player)
+    # Validate engine
+    if engine not in ENGINE_OPTIONS:
+        print("error: <engine> should be [" + ", ".join(ENGINE_OPTIONS) + "]")
+        sys.exit(-1)
+
+    elcipse = Eclipse(t_limit, c_player, engine, trace=trace)
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+import math
+import random
+import time
+
+import numpy as np
+
+from engine import SearchStats
+from playout import run_playouts
+from tile import Tile
+
+# Playouts stop after this many plies and are scored by the evaluation,
+# squashed into a win probability with the given scale
+PLAYOUT_PLIES = 40
+PLAYOUT_SCALE = 4.0
+
+
+class Node:
+    __slots__ = ["move", "player", "parent", "children", "untried", "visits", "wins"]
+
+    def __init__(self, move, player, parent, moves):
+
+        # player made move to reach this node, wins are counted for them
+        self.move = move
+        self.player = player
+        self.parent = parent
+        self.children = {}
+        self.untried = moves
+        self.visits = 0
+        self.wins = 0.0
+
+    def select_child(self, exploration):
+        # Upper confidence bound applied to trees
+        log_visits = math.log(self.visits)
+        return max(
+            self.children.values(),
+            key=lambda child: child.wins / child.visits
+            + exploration * math.sqrt(log_visits / child.visits),
+        )
+
+
+class MCTSEngine:
+    def __init__(
+        self,
+        exploration=1.4,
+        playout_plies=PLAYOUT_PLIES,
+        constants=None,
+        seed=None,
+        playout_batch=1,
+    ):
+        self.options = dict(
+            exploration=exploration,
+            playout_plies=playout_plies,
+            constants=constants,
+            seed=seed,
+            playout_batch=playout_batch,
+        )
+        self.exploration = exploration
+        self.playout_plies = playout_plies
+        self.constants = constants if constants is not None else [1, 1, 0.1, 0.1]
+        self.rng = random.Random(seed)
+
+        # More than one playout per leaf runs them in lockstep with numpy,
+        # that only plays more playouts a second than single ones from about
+        # 16 a leaf on, below that the numpy overhead makes it slower
+        self.playout_batch = playout_batch
+        self.np_rng = np.random.default_rng(seed)
+
+        # The tree of the last search, reused when the game continues from it
+        self.root = None
+        self.root_plies = 0
+        self.root_hash = None
+
+        # Kept for a common interface with the alpha-beta engine
+        self.ply_depth = None
+        self.timed_out = False
+        self.stopped = False
+        self.stats = SearchStats()
+
+    def stop(self):
+        self.stopped = True
+
+    def out_of_time(self, max_time):
+        return self.stopped or time.time() > max_time
+
+    def progress(self):
+        # (tree depth, playouts, most visited move) of the running search
+        children = list(self.root.children.values()) if self.root else []
+        best = max(children, key=lambda child: child.visits, default=None)
+        return (
+            self.stats.depth,
+            self.stats.playouts,
+            best.move if best is not None else None,
+        )
+
+    def close(self):
+        self.root = None
+
+    def reuse_root(self, state):
+        # Walk the old tree along the moves played since the last search
+        node = self.root
+        if node is None or len(state.history) < self.root_plies:
+            return None
+        if len(state.history) == self.root_plies:
+            return node if state.hash == self.root_hash else None
+        if state.hashes[self.root_plies] != self.root_hash:
+            return None
+        for move in state.history[self.root_plies :]:
+            node = node.children.get(move)
+            if node is None:
+                return None
+        node.parent = None
+        return node
+
+    def playout(self, state, stats):
+        # Random moves until a big stone is trapped or the ply limit, returns
+        # the chance that white wins
+        plies = 0
+        winner = state.find_winner()
+        while not winner and plies < self.playout_plies:
+            state.make_move(self.rng.choice(state.get_next_moves()))
+            plies += 1
+            winner = state.find_winner()
+        stats.boards += plies
+
+        if winner:
+            result = 1.0 if winner == Tile.P_WHITE else 0.0
+        else:
+            value = state.utility_distance(Tile.P_WHITE, self.constants)
+            value = max(-50.0, min(50.0, value / PLAYOUT_SCALE))
+            result = 1.0 / (1.0 + math.exp(-value))
+
+        for ply in range(plies):
+            state.unmake_move()
+        return result
+
+    def iterate(self, state, root, stats):
+        node = root
+        plies = 0
+
+        # Selection through fully expanded nodes
+        while not node.untried and node.children:
+            node = node.select_child(self.exploration)
+            state.make_move(node.move)
+            plies += 1
+
+        # Expansion of one untried move
+        if node.untried:
+            move = node.untried.pop(self.rng.randrange(len(node.untried)))
+            player = state.current_player
+            state.make_move(move)
+            plies += 1
+            moves = [] if state.find_winner() else state.get_next_moves()
+            node.children[move] = node = Node(move, player, node, moves)
+        stats.depth = max(stats.depth, plies)
+
+        # Simulation and backpropagation
+        if self.playout_batch > 1:
+            results, boards = run_playouts(
+                state,
+                self.playout_batch,
+                self.playout_plies,
+                self.np_rng,
+                self.constants,
+            )
+            count, result = self.playout_batch, float(results.sum())
+            stats.boards += boards
+        else:
+            count, result = 1, self.playout(state, stats)
+        while node is not None:
+            node.visits += count
+            if node.player == Tile.P_WHITE:
+                node.wins += result
+            elif node.player == Tile.P_BLACK:
+                node.wins += count - result
+            node = node.parent
+
+        for ply in range(plies):
+            state.unmake_move()
+        stats.playouts += count
+
+    def search(self, state, time_limit):
+        stats = self.stats = SearchStats()
+        start = time.time()
+        max_time = start + time_limit
+        self.timed_out = False
+        self.stopped = False
+
+        # Search a private copy, the caller's position is left untouched
+        state = state.copy()
+        root = self.reuse_root(state)
+        if root is None:
+            moves = [] if state.find_winner() else state.get_next_moves()
+            root = Node(None, None, None, moves)
+        self.root, self.root_plies, self.root_hash = (
+            root,
+            len(state.history),
+            state.hash,
+        )
+        stats.reused = root.visits
+
+        moves = list(root.children) + root.untried
+        if len(moves) <= 1:
+            stats.time = time.time() - start
+            return (moves[0] if moves else None), stats
+
+        while not self.out_of_time(max_time) or not root.children:
+            self.iterate(state, root, stats)
+
+        # Play the most visited move
+        best = max(root.children.values(), key=lambda child: child.visits)
+        stats.value = best.wins / best.visits
+        stats.time = time.time() - start
+        return best.move, stats
@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import MAX_PLY, Engine, SearchStats
+from mcts import MCTSEngine
+from state import GameState
+from ttable import SharedTranspositionTable
+
+# Per process globals of the pool workers, set up by _init_worker,
+# _init_helper or _init_mcts_worker
+_worker_engine = None
+_worker_index = None
+_shared_alpha = None
+
+
+def _init_worker(options, alpha, stop_flag):
+    global _worker_engine, _shared_alpha
+    _worker_engine = HelperEngine(stop_flag, **options)
+    _shared_alpha = alpha
+
+
+def _search_root_move(state, move, depth, max_time):
+    engine = _worker_engine
+    engine.root_player = state.current_player
+    engine.timed_out = False
+    stats = SearchStats()
+
+    # A move only has to prove it is no better than the best root score any
+    # worker has found so far, only improvements come back exact
+    alpha = _shared_alpha.value
+    state.make_move(move)
+    stats.boards += 1
+    if engine.algorithm == "pvs":
+        val = -engine.pvs(
+            state, depth - 1, float("-inf"), -alpha, max_time, stats, ply=1
+        )[0]
+    else:
+        val = engine.minimax(
+            state,
+            depth - 1,
+            engine.root_player,
+            max_time,
+            stats,
+            a=alpha,
+            maxing=False,
+            ply=1,
+        )[0]
+
+    if not engine.timed_out:
+        with _shared_alpha.get_lock():
+            if val > _shared_alpha.value:
+                _shared_alpha.value = val
+    return move, val, engine.timed_out, stats
+
+
+class HelperEngine(Engine):
+    def __init__(self, stop_flag, **options):
+        Engine.__init__(self, **options)
+        self.stop_flag = stop_flag
+
+    def out_of_time(self, max_time):
+        # Workers also give up as soon as the parent search is done or
+        # stopped
+        return self.stop_flag.value or Engine.out_of_time(self, max_time)
+
+
+def _init_helper(options, tt_name, stop_flag):
+    global _worker_engine
+    _worker_engine = HelperEngine(stop_flag, **dict(options, tt_size_mb=0))
+    _worker_engine.tt = SharedTranspositionTable(options["tt_size_mb"], tt_name)
+
+
+def _helper_search(state, index, generation, max_time):
+    engine = _worker_engine
+    engine.tt.generation = generation
+    engine.root_player = state.current_player
+    engine.timed_out = False
+    engine.killers = [[None, None] for ply in range(MAX_PLY)]
+    stats = SearchStats()
+
+    # Every second helper runs one ply ahead of the main search, so the
+    # helpers fill the shared table with entries the main search reaches
+    # later instead of repeating its work in lockstep
+    for depth in range(1 + index % 2, engine.ply_depth + 1):
+        engine.search_root(state, depth, None, max_time, stats)
+        if engine.timed_out:
+            break
+        stats.depth = depth
+    return index, stats
+
+
+class RootSplitEngine(Engine):
+    def __init__(self, workers=None, **options):
+        Engine.__init__(self, **options)
+        self.options["workers"] = workers
+
+        # Root moves are handed out to a pool of worker processes that keep
+        # their own engine (and transposition table) between searches
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = None
+        self.alpha = None
+        self.stop_flag = None
+        self.root_scores = {}
+
+    def start_pool(self):
+        if self.pool is None:
+            context = multiprocessing.get_context("spawn")
+            options = dict(self.options)
+            del options["workers"]
+            self.alpha = context.Value("d", float("-inf"))
+            self.stop_flag = context.RawValue("b", 0)
+            self.pool = ProcessPoolExecutor(
+                self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(options, self.alpha, self.stop_flag),
+            )
+
+    def stop(self):
+        # The workers end their root moves with the search
+        Engine.stop(self)
+        if self.stop_flag is not None:
+            self.stop_flag.value = 1
+
+    def search(self, state, time_limit):
+        self.start_pool()
+        self.stop_flag.value = 0
+        return Engine.search(self, state, time_limit)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+        Engine.close(self)
+
+    def search_root(self, state, depth, guess, max_time, stats):
+        self.start_pool()
+
+        # Best moves of the previous iteration go first
+        if depth == 1:
+            self.root_scores = {}
+        moves = state.get_next_moves()
+        moves.sort(key=lambda move: self.root_scores.get(move, float("-inf")))
+        moves.reverse()
+
+        # The first move is searched alone to give the others a bound
+        self.alpha.value = float("-inf")
+        results = [
+            self.pool.submit(_search_root_move, state, moves[0], depth, max_time)
+        ]
+        results[0].result()
+        results += [
+            self.pool.submit(_search_root_move, state, move, depth, max_time)
+            for move in moves[1:]
+        ]
+
+        best_val, best_move = float("-inf"), None
+        for future in results:
+            move, val, timed_out, worker_stats = future.result()
+            stats.merge(worker_stats)
+            self.timed_out |= timed_out
+            self.root_scores[move] = val
+            if val > best_val:
+                best_val, best_move = val, move
+        return best_val, best_move
+
+
+class LazySMPEngine(Engine):
+    def __init__(self, workers=None, **options):
+        Engine.__init__(self, **dict(options, tt_size_mb=0))
+        self.options["tt_size_mb"] = options.get("tt_size_mb", 16)
+        self.options["workers"] = workers
+
+        # The main search runs here, workers - 1 helper processes search the
+        # same position and only talk to it through the shared table
+        self.workers = workers or os.cpu_count() or 1
+        self.tt = SharedTranspositionTable(self.options["tt_size_mb"])
+        self.pool = None
+        self.stop_flag = None
+        self.helpers = []
+
+    def start_pool(self):
+        if self.pool is None and self.workers > 1:
+            context = multiprocessing.get_context("spawn")
+            options = dict(self.options)
+            del options["workers"]
+            self.stop_flag = context.RawValue("b", 0)
+            self.pool = ProcessPoolExecutor(
+                self.workers - 1,
+                mp_context=context,
+                initializer=_init_helper,
+                initargs=(options, self.tt.name, self.stop_flag),
+            )
+
+    def stop(self):
+        # The helpers end their searches with the main one
+        Engine.stop(self)
+        if self.stop_flag is not None:
+            self.stop_flag.value = 1
+
+    def close(self):
+        if self.pool is not None:
+            self.stop_flag.value = 1
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+        if self.tt is not None:
+            self.tt.close()
+            self.tt = None
+        Engine.close(self)
+
+    def search_root(self, state, depth, guess, max_time, stats):
+        # The helpers start with the first iteration, once the table has
+        # moved on to the generation of this search
+        if depth == 1 and self.pool is not None:
+            self.stop_flag.value = 0
+            self.helpers = [
+                self.pool.submit(
+                    _helper_search, state, index, self.tt.generation, max_time
+                )
+                for index in range(1, self.workers)
+            ]
+        return Engine.search_root(self, state, depth, guess, max_time, stats)
+
+    def search(self, state, time_limit):
+        self.start_pool()
+        self.helpers = []
+        move, stats = Engine.search(self, state, time_limit)
+
+        # Stop the helpers and count their nodes with the main search
+        if self.stop_flag is not None:
+            self.stop_flag.value = 1
+        for helper in self.helpers:
+            index, helper_stats = helper.result()
+            stats.merge(helper_stats)
+        self.helpers = []
+        return move, stats
+
+
+class HelperMCTS(MCTSEngine):
+    def __init__(self, stop_flag, **options):
+        MCTSEngine.__init__(self, **options)
+        self.stop_flag = stop_flag
+
+    def out_of_time(self, max_time):
+        # Trees stop growing as soon as the parent search is stopped
+        return self.stop_flag.value or MCTSEngine.out_of_time(self, max_time)
+
+
+def _init_mcts_worker(options, counter, stop_flag):
+    global _worker_engine, _worker_index
+    with counter.get_lock():
+        _worker_index = counter.value
+        counter.value += 1
+
+    # Workers grow different trees from different seeds
+    if options["seed"] is not None:
+        options = dict(options, seed=options["seed"] + _worker_index)
+    _worker_engine = HelperMCTS(stop_flag, **options)
+
+
+def _mcts_search(state, max_time):
+    engine = _worker_engine
+    move, stats = engine.search(state, max_time - time.time())
+    children = {
+        move: (child.visits, child.wins) for move, child in engine.root.children.items()
+    }
+    return _worker_index, children, stats
+
+
+class RootParallelMCTS(MCTSEngine):
+    def __init__(self, workers=None, **options):
+        MCTSEngine.__init__(self, **options)
+
+        # Every worker process grows its own tree of the position (and keeps
+        # it for the next turn), the root visits are added up at the deadline
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = None
+        self.stop_flag = None
+
+    def start_pool(self):
+        if self.pool is None:
+            context = multiprocessing.get_context("spawn")
+            self.stop_flag = context.RawValue("b", 0)
+            self.pool = ProcessPoolExecutor(
+                self.workers,
+                mp_context=context,
+                initializer=_init_mcts_worker,
+                initargs=(self.options, context.Value("i", 0), self.stop_flag),
+            )
+
+    def stop(self):
+        MCTSEngine.stop(self)
+        if self.stop_flag is not None:
+            self.stop_flag.value = 1
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def search(self, state, time_limit):
+        stats = SearchStats()
+        start = time.time()
+        moves = [] if state.find_winner() else state.get_next_moves()
+        if len(moves) <= 1:
+            stats.time = time.time() - start
+            return (moves[0] if moves else None), stats
+
+        self.start_pool()
+        self.stopped = False
+        self.stop_flag.value = 0
+        futures = [
+            self.pool.submit(_mcts_search, state, start + time_limit)
+            for worker in range(self.workers)
+        ]
+        visits = {}
+        for future in futures:
+            index, children, worker_stats = future.result()
+            stats.merge(worker_stats)
+            stats.depth = max(stats.depth, worker_stats.depth)
+            stats.reused += worker_stats.reused
+            stats.workers.append(
+                (index, worker_stats.playouts, worker_stats.playouts_per_second())
+            )
+            for move, (count, wins) in children.items():
+                total = visits.get(move, (0, 0.0))
+                visits[move] = (total[0] + count, total[1] + wins)
+
+        # Play the move with the most visits over all trees
+        best = max(visits, key=lambda move: visits[move][0])
+        stats.value = visits[best][1] / visits[best][0]
+        stats.time = time.time() - start
+        return best, stats
+
+
+# Parallel engines selectable from the command line
+ENGINES = {"split": RootSplitEngine, "lazy": LazySMPEngine}
+
+
+def measure_speedup(state, depth, workers, engine_class=RootSplitEngine, **options):
+    # Time a serial and a parallel search of the same fixed depth
+    serial = Engine(ply_depth=depth, **options)
+    start = time.time()
+    serial_move, serial_stats = serial.search(state, float("inf"))
+    serial_time = time.time() - start
+
+    # Start the workers before the clock runs
+    parallel = engine_class(workers=workers, ply_depth=depth, **options)
+    parallel.start_pool()
+    if parallel.pool is not None:
+        list(parallel.pool.map(abs, range(parallel.workers)))
+    start = time.time()
+    parallel_move, parallel_stats = parallel.search(state, float("inf"))
+    parallel_time = time.time() - start
+    parallel.close()
+
+    return {
+        "depth": depth,
+        "workers": parallel.workers,
+        "serial_time": serial_time,
+        "serial_boards": serial_stats.boards,
+        "serial_value": serial_stats.value,
+        "parallel_time": parallel_time,
+        "parallel_boards": parallel_stats.boards,
+        "parallel_value": parallel_stats.value,
+        "speedup": serial_time / parallel_time if parallel_time else 0.0,
+    }
+
+
+if __name__ == "__main__":
+
+    # Catch missing parameters
+    if (
+        len(sys.argv) < 2
+        or not all(arg.isdigit() for arg in sys.argv[1:3])
+        or len(sys.argv) > 3
+        and sys.argv[3] not in ENGINES
+    ):
+        print("usage: parallel.py <depth> [<workers>] [split|lazy]")
+        sys.exit(-1)
+
+    depth = int(sys.argv[1])
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    engine_class = ENGINES[sys.argv[3] if len(sys.argv) > 3 else "split"]
+
+    result = measure_speedup(GameState(), depth, workers, engine_class)
+    print(engine_class.__name__, "speedup")
+    print("=" * len(engine_class.__name__ + " speedup"))
+    print("Depth:", result["depth"], "Workers:", result["workers"])
+    print(
+        "Serial:  ",
+        round(result["serial_time"], 3),
+        "s,",
+        result["serial_boards"],
+        "boards",
+    )
+    print(
+        "Parallel:",
+        round(result["parallel_time"], 3),
+        "s,",
+        result["parallel_boards"],
+        "boards",
+    )
+    print("Speedup:", round(result["speedup"], 2))
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from batch import utility_distance_batch
+from state import BIG_SLOT, MOVE_SHIFT, SLOT_TYPE, SLOTS_PER_SIDE
+from tables import CROSSING, N_CELLS, N_SEGMENTS, NEIGHBOUR_SEGMENTS, SEGMENT_INDEX
+from tile import Tile
+
+# Neighbour lists padded to a common width with an extra cell that is always
+# occupied, and the segment of every (cell, neighbour) step
+WIDTH = max(len(cells) for table in NEIGHBOUR_SEGMENTS for cells in table)
+NEIGHBOUR_ARRAY = np.full((3, N_CELLS + 1, WIDTH), N_CELLS, dtype=np.int64)
+STEP_SEGMENT_ARRAY = np.zeros((3, N_CELLS + 1, WIDTH), dtype=np.int64)
+for stone_type, table in enumerate(NEIGHBOUR_SEGMENTS):
+    for cell, steps in enumerate(table):
+        for k, (dest, segment) in enumerate(steps):
+            NEIGHBOUR_ARRAY[stone_type, cell, k] = dest
+            STEP_SEGMENT_ARRAY[stone_type, cell, k] = segment
+
+SEGMENT_ARRAY = np.array(SEGMENT_INDEX, dtype=np.int64)
+CROSSING_ARRAY = np.array(
+    [[CROSSING[s] >> t & 1 for t in range(N_SEGMENTS)] for s in range(N_SEGMENTS)],
+    dtype=bool,
+)
+
+# Per side: the slot that moves, the slot it swings around (itself for the
+# big stone), its stone type and its chain
+MOVER_SLOTS = np.arange(BIG_SLOT + 1)
+PIVOT_SLOTS = np.array([slot ^ 1 for slot in range(BIG_SLOT)] + [BIG_SLOT])
+MOVER_TYPES = np.array(SLOT_TYPE[: BIG_SLOT + 1])
+MOVER_CHAINS = MOVER_SLOTS >> 1
+CHAINS = np.arange(BIG_SLOT >> 1)
+LONG = np.array([2, 3, 4])
+
+# Squashing of the evaluation of unfinished playouts, as in mcts.py
+PLAYOUT_SCALE = 4.0
+
+
+class PlayoutBatch:
+    def __init__(self, state, count):
+
+        # count copies of the position, one row each
+        self.pos = np.tile(np.asarray(state.pos, dtype=np.int64), (count, 1))
+        self.moved = np.tile(np.asarray(state.moved, dtype=np.int64), (count, 1))
+        self.chain_seg = np.tile(
+            np.asarray(state.chain_seg, dtype=np.int64), (count, 1)
+        )
+        occupied = [state.occupied >> cell & 1 for cell in range(N_CELLS)] + [1]
+        self.occ = np.tile(np.asarray(occupied, dtype=bool), (count, 1))
+        self.player = state.current_player
+        self.plies = state.total_plies
+        self.winner = np.zeros(count, dtype=np.int64)
+        self.rows = np.arange(count)
+        self.boards = 0
+
+    def big_moves(self, side):
+        # Empty neighbours of the big stone not behind an enemy long chain
+        big = self.pos[:, side * SLOTS_PER_SIDE + BIG_SLOT]
+        dests = NEIGHBOUR_ARRAY[Tile.ST_BIG, big]
+        segments = STEP_SEGMENT_ARRAY[Tile.ST_BIG, big]
+        chains = self.chain_seg[:, (1 - side) * (SLOTS_PER_SIDE >> 1) + LONG]
+        crossed = CROSSING_ARRAY[segments[:, :, None], chains[:, None, :]].any(2)
+        return ~np.take_along_axis(self.occ, dests, 1) & ~crossed
+
+    def legal_moves(self):
+        # (rows, 11, WIDTH) mask of legal moves and their destinations
+        side = self.player - 1
+        base = side * SLOTS_PER_SIDE
+        pivots = self.pos[:, base + PIVOT_SLOTS]
+        dests = NEIGHBOUR_ARRAY[MOVER_TYPES[None, :], pivots]
+        empty = ~np.take_along_axis(self.occ, dests.reshape(len(dests), -1), 1).reshape(
+            dests.shape
+        )
+
+        # Chains are pinned by a crossing enemy chain that moved later
+        own = base // 2 + CHAINS
+        enemy = (1 - side) * (SLOTS_PER_SIDE >> 1) + CHAINS
+        cross = CROSSING_ARRAY[
+            self.chain_seg[:, own][:, :, None], self.chain_seg[:, enemy][:, None, :]
+        ]
+        later = self.moved[:, enemy][:, None, :] > self.moved[:, own][:, :, None]
+        pinned = (cross & later).any(2)
+
+        legal = empty
+        legal[:, :BIG_SLOT] &= ~pinned[:, MOVER_CHAINS[:BIG_SLOT]][:, :, None]
+        legal[:, BIG_SLOT] = self.big_moves(side)
+        return legal, dests
+
+    def move_codes(self, row):
+        # Legal moves of one row in the packed form of GameState
+        legal, dests = self.legal_moves()
+        base = (self.player - 1) * SLOTS_PER_SIDE
+        return sorted(
+            (base + mover) << MOVE_SHIFT | dests[row, mover, k]
+            for mover, k in zip(*np.nonzero(legal[row]))
+        )
+
+    def update_winner(self):
+        # Same precedence as GameState.find_winner
+        white = self.big_moves(Tile.P_WHITE - 1).any(1)
+        black = self.big_moves(Tile.P_BLACK - 1).any(1)
+        winner = np.where(~white, Tile.P_BLACK, np.where(~black, Tile.P_WHITE, 0))
+        self.winner = np.where(self.winner != 0, self.winner, winner)
+
+    def step(self, rng):
+        # One random legal move in every unfinished row
+        legal, dests = self.legal_moves()
+        keys = rng.random(legal.shape)
+        keys[~legal] = -1.0
+        choice = keys.reshape(len(keys), -1).argmax(1)
+        mover, k = choice // WIDTH, choice % WIDTH
+
+        rows = self.rows[self.winner == 0]
+        mover, k = mover[rows], k[rows]
+        self.boards += len(rows)
+        slot = (self.player - 1) * SLOTS_PER_SIDE + mover
+        dest = dests[rows, mover, k]
+        self.occ[rows, self.pos[rows, slot]] = False
+        self.occ[rows, dest] = True
+        self.pos[rows, slot] = dest
+
+        self.plies += 1
+        self.moved[rows, slot >> 1] = self.plies
+        chain = mover < BIG_SLOT
+        self.chain_seg[rows[chain], slot[chain] >> 1] = SEGMENT_ARRAY[
+            dest[chain], self.pos[rows[chain], slot[chain] ^ 1]
+        ]
+        self.player = 3 - self.player
+
+    def run(self, max_plies, rng, constants):
+        # Plays every row out and returns the chances that white wins
+        self.update_winner()
+        for ply in range(max_plies):
+            if self.winner.all():
+                break
+            self.step(rng)
+            self.update_winner()
+
+        value = utility_distance_batch(self.pos, Tile.P_WHITE, constants)
+        value = np.clip(value / PLAYOUT_SCALE, -50.0, 50.0)
+        result = 1.0 / (1.0 + np.exp(-value))
+        result[self.winner == Tile.P_WHITE] = 1.0
+        result[self.winner == Tile.P_BLACK] = 0.0
+        return result
+
+
+def run_playouts(state, count, max_plies, rng, constants):
+    # count random playouts of state advanced in lockstep, returns the white
+    # win chances and the number of moves played
+    batch = PlayoutBatch(state, count)
+    return batch.run(max_plies, rng, constants), batch.boards
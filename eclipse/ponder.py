@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from batch import evaluate_children
+from mcts import MCTSEngine
+
+# Tree searches ponder in slices of this many seconds, each one continues the
+# tree of the last
+PONDER_SLICE = 1.0
+
+
+class Ponderer:
+    def __init__(self, engine, time_limit, alternatives=2):
+
+        # The engine searches in a background thread while the opponent
+        # thinks, its tables (or its tree) are warm when the real move comes
+        self.engine = engine
+        self.time_limit = time_limit
+        self.alternatives = alternatives
+        self.thread = None
+        self.active = False
+
+        # Position hash -> (move, stats) of ponder searches that finished with
+        # at least a full turn of time
+        self.results = {}
+        self.hits = 0
+        self.misses = 0
+
+    def start(self, state):
+        # state has the opponent to move
+        self.stop()
+        self.results = {}
+        self.active = True
+        self.thread = threading.Thread(
+            target=self.run, args=(state.copy(),), daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        # The engine may only have started its next search after a stop
+        # request, so repeat it until the thread is gone
+        self.active = False
+        while self.thread is not None and self.thread.is_alive():
+            self.engine.stop()
+            self.thread.join(0.01)
+        self.thread = None
+
+    def predict(self, state):
+        # The hash move of the last search first (with a table), then the
+        # best replies by the evaluation of the opponent
+        moves = state.get_next_moves()
+        scores = evaluate_children(
+            state, moves, state.current_player, self.engine.constants
+        )
+        replies = [move for score, move in sorted(zip(scores, moves), reverse=True)]
+        entry = None
+        if self.engine.tt is not None:
+            entry = self.engine.tt.probe(state.hash)
+        if entry is not None and entry[0] in replies:
+            replies.remove(entry[0])
+            replies.insert(0, entry[0])
+        return replies[: 1 + self.alternatives]
+
+    def run(self, state):
+        if state.find_winner():
+            return
+
+        # Tree searches keep growing the tree of the opponent's position,
+        # alpha beta searches may run without a table
+        if isinstance(self.engine, MCTSEngine):
+            while self.active:
+                move, stats = self.engine.search(state, PONDER_SLICE)
+                if not stats.playouts:
+                    return
+            return
+
+        # The predicted reply gets a full turn, the alternatives half of one,
+        # then every round doubles the time until the real move arrives
+        replies = self.predict(state)
+        limit = self.time_limit
+        while self.active:
+            complete = True
+            for i, reply in enumerate(replies):
+                child = state.copy()
+                child.make_move(reply)
+                if child.find_winner():
+                    continue
+                reply_limit = limit if i == 0 else limit / 2
+                move, stats = self.engine.search(child, reply_limit)
+                if not self.active:
+                    return
+                if reply_limit >= self.time_limit:
+                    self.results[child.hash] = (move, stats)
+                complete &= stats.book or stats.depth >= self.engine.ply_depth
+            if complete:
+                return
+            limit *= 2
+
+    def result(self, state):
+        # Stops pondering, returns (move, stats) when state was searched to
+        # the end of a full turn already and None otherwise
+        self.stop()
+        result = self.results.get(state.hash)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        self.results = {}
+        return result
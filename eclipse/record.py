@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+from tile import Tile
+
+# A record file is a header followed by little endian 16 bit words, games are
+# only ever appended so a game in progress can be written move by move:
+#   header  magic, format version, reserved
+#   START   marker word, layout (the colour at the bottom)
+#   ply     slot << 6 | destination, slot = side * 12 + chain * 2 + piece
+#   END     marker word, winner (0 for a draw)
+# A game without its END was not finished and is read with winner None.
+HEADER = struct.Struct("<4sHH")
+MAGIC = b"ECLG"
+VERSION = 1
+START = 0xFFFE
+END = 0xFFFF
+
+# The game appends the games played in the window to this file
+DEFAULT_RECORD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "games.ecg")
+
+# Words read from disk at a time
+BLOCK_WORDS = 1 << 19
+
+
+def is_record(path):
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+class GameWriter:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(MAGIC, VERSION, 0))
+            self.file.flush()
+        elif not is_record(path):
+            self.file.close()
+            raise ValueError("not a game record: " + str(path))
+
+    def write(self, *words):
+        # Every call reaches the disk, a game survives a crash up to its
+        # last move
+        self.file.write(struct.pack("<%dH" % len(words), *words))
+        self.file.flush()
+
+    def start(self, down=Tile.P_WHITE):
+        self.write(START, Tile.P_BLACK if down == Tile.P_BLACK else Tile.P_WHITE)
+
+    def move(self, move):
+        self.write(move)
+
+    def end(self, winner):
+        self.write(END, winner or 0)
+
+    def write_game(self, moves, winner, down=Tile.P_WHITE):
+        self.write(
+            START,
+            Tile.P_BLACK if down == Tile.P_BLACK else Tile.P_WHITE,
+            *moves,
+            END,
+            winner or 0
+        )
+
+    def close(self):
+        self.file.close()
+
+
+def read_games(path, block_words=BLOCK_WORDS):
+    # Generator of {"down", "moves", "winner"} per game, the file is read a
+    # block at a time and the markers are found with numpy
+    with open(path, "rb") as file:
+        magic, version, reserved = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a game record: " + str(path))
+
+        game = None
+        tail = np.empty(0, dtype="<u2")
+        while True:
+            data = file.read(2 * block_words)
+            if len(data) < 2:
+                break
+            words = np.frombuffer(data[: len(data) & ~1], dtype="<u2")
+            words = np.concatenate([tail, words])
+
+            # A marker without its value waits for the next block
+            markers = np.flatnonzero(words >= START)
+            end = len(words)
+            if len(markers) and markers[-1] == end - 1:
+                end = markers[-1]
+                markers = markers[:-1]
+            tail = words[end:]
+
+            start = 0
+            for i in markers.tolist():
+                if game is not None:
+                    game["moves"].extend(words[start:i].tolist())
+                value = int(words[i + 1])
+                if words[i] == START:
+                    if game is not None:
+                        yield game
+                    game = {"down": value, "moves": [], "winner": None}
+                elif game is not None:
+                    game["winner"] = value
+                    yield game
+                    game = None
+                start = i + 2
+            if game is not None:
+                game["moves"].extend(words[start:end].tolist())
+        if game is not None:
+            yield game
+
+
+def read_game_files(paths):
+    # Games of record files and of the JSON lines of tournament.py alike
+    for path in paths:
+        if is_record(path):
+            yield from read_games(path)
+            continue
+        with open(path) as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+if __name__ == "__main__":
+
+    # Catch missing parameters
+    if len(sys.argv) < 2:
+        print("usage: record.py <record-file> [<games-file> ...]")
+        sys.exit(-1)
+
+    # Append the games of other files (e.g. JSON lines of tournament.py)
+    if len(sys.argv) > 2:
+        writer = GameWriter(sys.argv[1])
+        for game in read_game_files(sys.argv[2:]):
+            writer.write_game(game["moves"], game["winner"], game.get("down"))
+        writer.close()
+
+    games, plies, results = 0, 0, {}
+    for game in read_games(sys.argv[1]):
+        games += 1
+        plies += len(game["moves"])
+        results[game["winner"]] = results.get(game["winner"], 0) + 1
+    print("Games:", games)
+    print("Plies:", plies)
+    print(
+        "Results: white",
+        results.get(Tile.P_WHITE, 0),
+        "black",
+        results.get(Tile.P_BLACK, 0),
+        "draw",
+        results.get(0, 0),
+        "unfinished",
+        results.get(None, 0),
+    )
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+import random
+import sys
+import time
+
+from state import (
+    BIG_SLOT,
+    MOVE_MASK,
+    MOVE_SHIFT,
+    SLOT_TYPE,
+    SLOTS_PER_SIDE,
+    GameState,
+)
+from tables import NEIGHBOUR_MASK
+from tile import Tile
+
+# Nodes between two looks at the clock
+CHECK_EVERY = 256
+
+
+class SolverTimeout(Exception):
+    pass
+
+
+class MateSolver:
+    def __init__(self):
+
+        # (hash, moves left) -> winning move or None for the attacker to move,
+        # True or False for the defender to move
+        self.attacks = {}
+        self.defences = {}
+        self.nodes = 0
+        self.max_time = None
+
+    def tick(self):
+        self.nodes += 1
+        if self.nodes % CHECK_EVERY == 0 and time.time() > self.max_time:
+            raise SolverTimeout()
+
+    def mating_moves(self, state):
+        # Moves that can take the last escapes of the enemy big stone: a piece
+        # landing next to it, or a long chain whose new segment blocks steps.
+        # With two or more escapes left only a long chain can block them all.
+        enemy = 3 - state.current_player
+        escapes = state.big_mobility(enemy)
+        big = state.pos[(enemy - 1) * SLOTS_PER_SIDE + BIG_SLOT]
+        around = NEIGHBOUR_MASK[Tile.ST_BIG][big]
+        moves = []
+        for move in state.get_next_moves():
+            stone_type = SLOT_TYPE[move >> MOVE_SHIFT]
+            if stone_type == Tile.ST_LONG or (
+                escapes == 1 and around >> (move & MOVE_MASK) & 1
+            ):
+                moves.append(move)
+        return moves
+
+    def ordered_moves(self, state):
+        # Moves next to the enemy big stone first, then long chains
+        enemy = 3 - state.current_player
+        big = state.pos[(enemy - 1) * SLOTS_PER_SIDE + BIG_SLOT]
+        around = NEIGHBOUR_MASK[Tile.ST_BIG][big]
+        return sorted(
+            state.get_next_moves(),
+            key=lambda move: (
+                not around >> (move & MOVE_MASK) & 1,
+                SLOT_TYPE[move >> MOVE_SHIFT] != Tile.ST_LONG,
+            ),
+        )
+
+    def attack(self, state, moves_left):
+        # A move of the side to move that wins within moves_left own moves
+        key = (state.hash, moves_left)
+        if key in self.attacks:
+            return self.attacks[key]
+        self.tick()
+
+        attacker = state.current_player
+        if moves_left == 1:
+            moves = self.mating_moves(state)
+        else:
+            moves = self.ordered_moves(state)
+
+        found = None
+        for move in moves:
+            state.make_move(move)
+            winner = state.find_winner()
+            if winner == attacker:
+                win = True
+            elif winner or moves_left == 1:
+                win = False
+            else:
+                win = self.defend(state, moves_left - 1)
+            state.unmake_move()
+            if win:
+                found = move
+                break
+
+        self.attacks[key] = found
+        return found
+
+    def defend(self, state, moves_left):
+        # True when every move of the side to move loses within moves_left
+        # moves of the opponent
+        key = (state.hash, moves_left)
+        if key in self.defences:
+            return self.defences[key]
+        self.tick()
+
+        defender = state.current_player
+        lost = True
+        for move in state.get_next_moves():
+            state.make_move(move)
+            winner = state.find_winner()
+            if winner:
+                lost = winner != defender
+            else:
+                lost = self.attack(state, moves_left) is not None
+            state.unmake_move()
+            if not lost:
+                break
+
+        self.defences[key] = lost
+        return lost
+
+    def solve(self, state, max_moves, time_limit):
+        # Shortest forced win of the side to move within max_moves own moves,
+        # returns (move, moves to win) or None when there is none or no time
+        self.max_time = time.time() + time_limit
+        state = state.copy()
+        try:
+            for moves_left in range(1, max_moves + 1):
+                move = self.attack(state, moves_left)
+                if move is not None:
+                    return move, moves_left
+        except SolverTimeout:
+            pass
+        return None
+
+
+if __name__ == "__main__":
+
+    # Catch missing parameters
+    if len(sys.argv) < 3 or not all(arg.isdigit() for arg in sys.argv[1:3]):
+        print("usage: solver.py <moves> <t-limit>")
+        sys.exit(-1)
+
+    # Solve the positions of random games where a big stone runs short of room
+    max_moves, t_limit = int(sys.argv[1]), int(sys.argv[2])
+    rng = random.Random(0)
+    for game in range(5):
+        state = GameState()
+        while not state.find_winner():
+            if state.big_mobility(3 - state.current_player) <= 2:
+                solver = MateSolver()
+                start = time.time()
+                result = solver.solve(state, max_moves, t_limit)
+                print(
+                    "ply",
+                    state.total_plies,
+                    "mate" if result else "none",
+                    result[1] if result else "",
+                    solver.nodes,
+                    "nodes,",
+                    round(time.time() - start, 3),
+                    "s",
+                )
+            state.make_move(rng.choice(state.get_next_moves()))
@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+from tile import Tile
+from stones import Stones
+from tables import (
+    BIG_BLOCKED,
+    CELLS,
+    CELL_INDEX,
+    CROSSING,
+    DISTANCE,
+    NEIGHBOUR_MASK,
+    NEIGHBOUR_SEGMENTS,
+    SEGMENT_INDEX,
+    ZOBRIST_ORDER,
+    ZOBRIST_PIECE,
+    ZOBRIST_SIDE,
+)
+
+# Pieces live in slots: side * 12 + chain * 2 + piece for the five chains of
+# a side (chains 0-1 short, 2-4 long) and side * 12 + 10 for the big stone.
+# The chain of a slot is slot >> 1 and its partner piece is slot ^ 1.
+SLOTS_PER_SIDE = 12
+BIG_SLOT = 10
+SHORT_CHAINS = [0, 1]
+LONG_CHAINS = [2, 3, 4]
+
+SLOT_TYPE = [
+    Tile.ST_SHORT if k < 4 else Tile.ST_LONG if k < 10 else Tile.ST_BIG
+    for side in [0, 1]
+    for k in range(SLOTS_PER_SIDE)
+]
+
+# Moves are packed as slot << 6 | destination cell
+MOVE_SHIFT = 6
+MOVE_MASK = (1 << MOVE_SHIFT) - 1
+
+
+class GameState:
+    def __init__(self, down=Tile.P_WHITE):
+
+        # Read the initial layout, sides are indexed by player colour - 1
+        stones = Stones(down=down)
+        self.down = down
+        self.player_pos = [0, 1] if down == Tile.P_BLACK else [1, 0]
+
+        self.pos = [-1] * (2 * SLOTS_PER_SIDE)
+        for side in [0, 1]:
+            p_place = self.player_pos[side]
+            base = side * SLOTS_PER_SIDE
+            for i in SHORT_CHAINS:
+                for piece in [0, 1]:
+                    col, row = stones.short[p_place][i][piece]
+                    self.pos[base + i * 2 + piece] = CELL_INDEX[col][row]
+            for i in LONG_CHAINS:
+                for piece in [0, 1]:
+                    col, row = stones.long[p_place][i - 2][piece]
+                    self.pos[base + i * 2 + piece] = CELL_INDEX[col][row]
+            col, row = stones.big[p_place]
+            self.pos[base + BIG_SLOT] = CELL_INDEX[col][row]
+
+        # Move-order stamp per chain (slot >> 1), 0 when never moved
+        self.moved = [0] * SLOTS_PER_SIDE
+
+        # Segment id spanned by each chain, -1 for the big stones
+        self.chain_seg = [
+            (
+                SEGMENT_INDEX[self.pos[chain * 2]][self.pos[chain * 2 + 1]]
+                if SLOT_TYPE[chain * 2] != Tile.ST_BIG
+                else -1
+            )
+            for chain in range(SLOTS_PER_SIDE)
+        ]
+
+        # Occupancy bitboards per colour and per stone type
+        self.colour_occ = [0, 0]
+        self.type_occ = [0, 0, 0]
+        for slot, cell in enumerate(self.pos):
+            if cell >= 0:
+                self.colour_occ[slot // SLOTS_PER_SIDE] |= 1 << cell
+                self.type_occ[SLOT_TYPE[slot]] |= 1 << cell
+        self.occupied = self.colour_occ[0] | self.colour_occ[1]
+
+        self.current_player = Tile.P_WHITE
+        self.total_plies = 0
+
+        # Played moves and what unmake_move needs to take them back, packed
+        # as the source cell | previous chain stamp << 6, plus previous keys
+        self.history = []
+        self.undo = []
+        self.hashes = []
+
+        self.hash = self.compute_hash()
+
+        # Evaluation totals per side, saved on far_stack by make_move
+        self.far = [self.compute_far(0), self.compute_far(1)]
+        self.far_stack = []
+
+    def copy(self):
+        state = GameState.__new__(GameState)
+        state.down = self.down
+        state.player_pos = self.player_pos
+        state.pos = self.pos[:]
+        state.moved = self.moved[:]
+        state.chain_seg = self.chain_seg[:]
+        state.colour_occ = self.colour_occ[:]
+        state.type_occ = self.type_occ[:]
+        state.occupied = self.occupied
+        state.current_player = self.current_player
+        state.total_plies = self.total_plies
+        state.history = self.history[:]
+        state.undo = self.undo[:]
+        state.hashes = self.hashes[:]
+        state.hash = self.hash
+        state.far = self.far[:]
+        state.far_stack = self.far_stack[:]
+        return state
+
+    def key(self):
+        return tuple(self.pos), tuple(self.moved), self.current_player
+
+    def order_relation(self, white_chain, black_chain):
+        moved1 = self.moved[white_chain]
+        moved2 = self.moved[black_chain + (SLOTS_PER_SIDE >> 1)]
+        return 0 if moved1 == moved2 else 1 if moved1 > moved2 else 2
+
+    def compute_hash(self):
+        # Zobrist key of pieces, chain move order and side to move from scratch
+        key = ZOBRIST_SIDE if self.current_player == Tile.P_BLACK else 0
+        for slot, cell in enumerate(self.pos):
+            if cell >= 0:
+                key ^= ZOBRIST_PIECE[slot >> 1][cell]
+        for a in SHORT_CHAINS + LONG_CHAINS:
+            for b in SHORT_CHAINS + LONG_CHAINS:
+                key ^= ZOBRIST_ORDER[a][b][self.order_relation(a, b)]
+        return key
+
+    def to_stones(self):
+        # Export the position in the coordinate layout used by the board view
+        stones = Stones(down=self.down)
+        for side in [0, 1]:
+            p_place = self.player_pos[side]
+            base = side * SLOTS_PER_SIDE
+            for i in SHORT_CHAINS:
+                for piece in [0, 1]:
+                    stones.short[p_place][i][piece] = list(
+                        CELLS[self.pos[base + i * 2 + piece]]
+                    )
+                stones.short_moved[p_place][i] = self.moved[(base >> 1) + i]
+            for i in LONG_CHAINS:
+                for piece in [0, 1]:
+                    stones.long[p_place][i - 2][piece] = list(
+                        CELLS[self.pos[base + i * 2 + piece]]
+                    )
+                stones.long_moved[p_place][i - 2] = self.moved[(base >> 1) + i]
+            stones.big[p_place] = list(CELLS[self.pos[base + BIG_SLOT]])
+            stones.big_moved[p_place] = self.moved[(base + BIG_SLOT) >> 1]
+        return stones
+
+    def move_squares(self, move):
+        # (row, col) locations of the moving piece and its destination
+        col, row = CELLS[self.pos[move >> MOVE_SHIFT]]
+        col2, row2 = CELLS[move & MOVE_MASK]
+        return (row, col), (row2, col2)
+
+    def find_move(self, loc_from, loc_to):
+        for move in self.get_next_moves():
+            if self.move_squares(move) == (tuple(loc_from), tuple(loc_to)):
+                return move
+        return None
+
+    def is_piece_blocked(self, player, stone_num):
+        # A chain is pinned by any crossing opponent chain moved after it
+        chain = (player - 1) * (SLOTS_PER_SIDE >> 1) + stone_num
+        op_base = (2 - player) * (SLOTS_PER_SIDE >> 1)
+        moved1 = self.moved[chain]
+        crossing = CROSSING[self.chain_seg[chain]]
+        for other in range(op_base, op_base + 5):
+            if self.moved[other] > moved1 and crossing >> self.chain_seg[other] & 1:
+                return True
+        return False
+
+    def long_chain_mask(self, player):
+        # Segments of the long chains of a player as a segment bitset
+        base = (player - 1) * (SLOTS_PER_SIDE >> 1)
+        chain_seg = self.chain_seg
+        return (
+            1 << chain_seg[base + 2]
+            | 1 << chain_seg[base + 3]
+            | 1 << chain_seg[base + 4]
+        )
+
+    def does_cross_chain(self, player, segment):
+        # The big stone may not jump over the long chains of the opponent
+        return CROSSING[segment] & self.long_chain_mask(3 - player) != 0
+
+    def find_moves_of_piece(self, player, stone_num):
+        # Chain moves swing one piece around its partner, so the destination
+        # is taken from the surrounding of the pivot and the other piece moves
+        base = (player - 1) * SLOTS_PER_SIDE
+        empty = ~self.occupied
+
+        if stone_num == BIG_SLOT >> 1:
+            slot = base + BIG_SLOT
+            chains = self.long_chain_mask(3 - player)
+            for dest, segment in NEIGHBOUR_SEGMENTS[Tile.ST_BIG][self.pos[slot]]:
+                if empty >> dest & 1 and not CROSSING[segment] & chains:
+                    yield slot << MOVE_SHIFT | dest
+            return
+
+        if self.is_piece_blocked(player, stone_num):
+            return
+
+        neighbour_mask = NEIGHBOUR_MASK[SLOT_TYPE[base + stone_num * 2]]
+        for piece in [0, 1]:
+            pivot = self.pos[base + stone_num * 2 + piece]
+            mover = (base + stone_num * 2 + 1 - piece) << MOVE_SHIFT
+            free = neighbour_mask[pivot] & empty
+            while free:
+                low = free & -free
+                free ^= low
+                yield mover | low.bit_length() - 1
+
+    def get_next_moves(self, player=None):
+        if player is None:
+            player = self.current_player
+
+        moves = []  # All possible moves
+        for stone_num in SHORT_CHAINS + LONG_CHAINS + [BIG_SLOT >> 1]:
+            moves.extend(self.find_moves_of_piece(player, stone_num))
+        return moves
+
+    def make_move(self, move):
+        slot = move >> MOVE_SHIFT
+        dest = move & MOVE_MASK
+        src = self.pos[slot]
+        bits = 1 << src | 1 << dest
+        stone_type = SLOT_TYPE[slot]
+
+        chain = slot >> 1
+        key = self.hash ^ ZOBRIST_SIDE ^ ZOBRIST_PIECE[chain][src]
+        key ^= ZOBRIST_PIECE[chain][dest]
+
+        self.history.append(move)
+        self.undo.append(src | self.moved[chain] << MOVE_SHIFT)
+        self.hashes.append(self.hash)
+        self.far_stack.append(self.far[0])
+        self.far_stack.append(self.far[1])
+
+        # The moved chain becomes the latest one against every opposing chain
+        if stone_type != Tile.ST_BIG:
+            moved1 = self.moved[chain]
+            if slot < SLOTS_PER_SIDE:
+                for other in SHORT_CHAINS + LONG_CHAINS:
+                    moved2 = self.moved[other + (SLOTS_PER_SIDE >> 1)]
+                    if moved1 <= moved2:
+                        order = ZOBRIST_ORDER[chain][other]
+                        key ^= order[0 if moved1 == moved2 else 2] ^ order[1]
+            else:
+                for other in SHORT_CHAINS + LONG_CHAINS:
+                    moved2 = self.moved[other]
+                    if moved1 <= moved2:
+                        order = ZOBRIST_ORDER[other][chain - (SLOTS_PER_SIDE >> 1)]
+                        key ^= order[0 if moved1 == moved2 else 1] ^ order[2]
+        self.hash = key
+
+        self.pos[slot] = dest
+        self.colour_occ[slot // SLOTS_PER_SIDE] ^= bits
+        self.type_occ[stone_type] ^= bits
+        self.occupied ^= bits
+
+        # Move-order stamps only need to be increasing, use the ply count
+        self.total_plies += 1
+        self.moved[slot >> 1] = self.total_plies
+        if stone_type != Tile.ST_BIG:
+            self.chain_seg[slot >> 1] = SEGMENT_INDEX[dest][self.pos[slot ^ 1]]
+
+        # The piece moved relative to the enemy big stone, and a big stone
+        # move changes every distance measured from it
+        side = slot // SLOTS_PER_SIDE
+        row = DISTANCE[self.pos[(1 - side) * SLOTS_PER_SIDE + BIG_SLOT]]
+        self.far[1 - side] += row[dest] - row[src]
+        if stone_type == Tile.ST_BIG:
+            self.far[side] = self.compute_far(side)
+
+        self.current_player = 3 - self.current_player
+
+    def unmake_move(self):
+        move = self.history.pop()
+        undo = self.undo.pop()
+        self.hash = self.hashes.pop()
+        self.far[1] = self.far_stack.pop()
+        self.far[0] = self.far_stack.pop()
+        slot = move >> MOVE_SHIFT
+        src = undo & MOVE_MASK
+        bits = 1 << src | 1 << (move & MOVE_MASK)
+        stone_type = SLOT_TYPE[slot]
+
+        self.pos[slot] = src
+        self.colour_occ[slot // SLOTS_PER_SIDE] ^= bits
+        self.type_occ[stone_type] ^= bits
+        self.occupied ^= bits
+
+        self.total_plies -= 1
+        self.moved[slot >> 1] = undo >> MOVE_SHIFT
+        if stone_type != Tile.ST_BIG:
+            self.chain_seg[slot >> 1] = SEGMENT_INDEX[src][self.pos[slot ^ 1]]
+
+        self.current_player = 3 - self.current_player
+        return move
+
+    def make_null_move(self):
+        # Pass the turn, only used by the search to probe the position
+        self.hash ^= ZOBRIST_SIDE
+        self.current_player = 3 - self.current_player
+
+    unmake_null_move = make_null_move
+
+    def big_moves_mask(self, player):
+        # Destinations of the big stone as a cell bitset: empty neighbours
+        # minus the steps blocked by one of the three enemy long chains
+        big = self.pos[(player - 1) * SLOTS_PER_SIDE + BIG_SLOT]
+        blocked = BIG_BLOCKED[big]
+        base = (2 - player) * (SLOTS_PER_SIDE >> 1)
+        chain_seg = self.chain_seg
+        return (
+            NEIGHBOUR_MASK[Tile.ST_BIG][big]
+            & ~self.occupied
+            & ~(
+                blocked[chain_seg[base + 2]]
+                | blocked[chain_seg[base + 3]]
+                | blocked[chain_seg[base + 4]]
+            )
+        )
+
+    def is_big_trapped(self, player):
+        return not self.big_moves_mask(player)
+
+    def big_mobility(self, player):
+        return bin(self.big_moves_mask(player)).count("1")
+
+    def find_winner(self):
+        if not self.big_moves_mask(Tile.P_WHITE):
+            return Tile.P_BLACK
+        if not self.big_moves_mask(Tile.P_BLACK):
+            return Tile.P_WHITE
+        return False
+
+    def compute_far(self, side):
+        # Summed distance from the big stone of a side to every enemy piece
+        row = DISTANCE[self.pos[side * SLOTS_PER_SIDE + BIG_SLOT]]
+        base = (1 - side) * SLOTS_PER_SIDE
+        return sum(sorted([row[cell] for cell in self.pos[base : base + BIG_SLOT + 1]]))
+
+    def utility_distance(self, player, constants):
+        # Distances come from the precomputed table and the totals over all
+        # pieces (value3, value4) are kept up to date by make_move. Those are
+        # running sums, so they can differ from a fresh sum in the last bits
+        # (below 1e-12 in practice); the nearest six are summed exactly as
+        # before.
+        side = player - 1
+        base1 = (1 - side) * SLOTS_PER_SIDE
+        base2 = side * SLOTS_PER_SIDE
+        row1 = DISTANCE[self.pos[base2 + BIG_SLOT]]
+        row2 = DISTANCE[self.pos[base1 + BIG_SLOT]]
+
+        values1 = sorted(
+            [row1[cell] for cell in self.pos[base1 : base1 + BIG_SLOT + 1]]
+        )
+        values2 = sorted(
+            [row2[cell] for cell in self.pos[base2 : base2 + BIG_SLOT + 1]]
+        )
+        value1 = sum(values1[0:6])
+        value2 = sum(values2[0:6])
+        value3 = self.far[side]
+        value4 = self.far[1 - side]
+
+        value = +constants[0] * value1
+        value -= constants[1] * value2
+        value += constants[2] * value3
+        value -= constants[3] * value4
+
+        return value
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+import math
+import random
+import sys
+
+# Board geometry shared by the search, computed once at import
+B_SIZE_X, B_SIZE_Y = 7, 15
+
+
+def is_on_board(row, col):
+    if (
+        not (0 <= col <= 6)
+        or not (0 <= row <= 14)
+        or (col + row) % 2 != 0
+        or (row == 0 and (col == 0 or col == 6))
+        or (row == 14 and (col == 0 or col == 6))
+    ):
+        return False
+    return True
+
+
+def line_intersect(line1, line2):
+    pt1, pt2 = line1
+    pt3, pt4 = line2
+    Ax1, Ay1, Ax2, Ay2, Bx1, By1, Bx2, By2 = pt1 + pt2 + pt3 + pt4
+    d = (By2 - By1) * (Ax2 - Ax1) - (Bx2 - Bx1) * (Ay2 - Ay1)
+    if d:
+        uA = ((Bx2 - Bx1) * (Ay1 - By1) - (By2 - By1) * (Ax1 - Bx1)) / d
+        uB = ((Ax2 - Ax1) * (Ay1 - By1) - (Ay2 - Ay1) * (Ax1 - Bx1)) / d
+    else:
+        return False
+    if not (0 <= uA <= 1 and 0 <= uB <= 1):
+        return False
+
+    return True
+
+
+# Playable cells as (col, row), numbered row by row; bit i of an occupancy
+# mask stands for CELLS[i]
+CELLS = [
+    (col, row)
+    for row in range(B_SIZE_Y)
+    for col in range(B_SIZE_X)
+    if is_on_board(row, col)
+]
+N_CELLS = len(CELLS)
+
+# Reverse lookup [col][row] -> cell index, -1 off the board
+CELL_INDEX = [[-1 for y in range(B_SIZE_Y)] for x in range(B_SIZE_X)]
+for i, (col, row) in enumerate(CELLS):
+    CELL_INDEX[col][row] = i
+
+# Relative (col, row) steps of each stone type, the big stone steps like a
+# short chain piece
+MOVES_MAP_SHORT = [[-1, 1], [1, -1], [-1, -1], [1, 1], [0, 2], [0, -2]]
+MOVES_MAP_LONG = MOVES_MAP_SHORT + [
+    [-1, 3],
+    [1, 3],
+    [1, -3],
+    [-1, -3],
+    [2, 0],
+    [-2, 0],
+]
+MOVES_MAPS = [MOVES_MAP_SHORT, MOVES_MAP_LONG, MOVES_MAP_SHORT]
+
+
+def tile_surrounding(cell, moves_map):
+    col, row = CELLS[cell]
+    return [
+        CELL_INDEX[col + d_col][row + d_row]
+        for d_col, d_row in moves_map
+        if is_on_board(row + d_row, col + d_col)
+    ]
+
+
+# NEIGHBOURS[stone_type][cell] lists the reachable cells, NEIGHBOUR_MASK holds
+# the same cells as a bitboard
+NEIGHBOURS = [
+    [tile_surrounding(cell, moves_map) for cell in range(N_CELLS)]
+    for moves_map in MOVES_MAPS
+]
+NEIGHBOUR_MASK = [
+    [sum(1 << dest for dest in dests) for dests in table] for table in NEIGHBOURS
+]
+
+# Every chain and every big stone step spans one of these cell-to-cell
+# segments, stored with the lower cell first. SEGMENT_INDEX[a][b] gives the
+# segment id for either orientation, -1 when the cells are not neighbours.
+SEGMENTS = [
+    (cell, dest)
+    for cell in range(N_CELLS)
+    for dest in NEIGHBOURS[1][cell]
+    if cell < dest
+]
+N_SEGMENTS = len(SEGMENTS)
+SEGMENT_INDEX = [[-1] * N_CELLS for cell in range(N_CELLS)]
+for i, (a, b) in enumerate(SEGMENTS):
+    SEGMENT_INDEX[a][b] = SEGMENT_INDEX[b][a] = i
+
+# NEIGHBOUR_SEGMENTS[stone_type][cell] pairs each destination with its segment
+NEIGHBOUR_SEGMENTS = [
+    [
+        [(dest, SEGMENT_INDEX[cell][dest]) for dest in dests]
+        for cell, dests in enumerate(table)
+    ]
+    for table in NEIGHBOURS
+]
+
+
+# Euclidean distance between two cells, as computed by the evaluation
+DISTANCE = [
+    [
+        math.sqrt((CELLS[b][0] - CELLS[a][0]) ** 2 + (CELLS[b][1] - CELLS[a][1]) ** 2)
+        for b in range(N_CELLS)
+    ]
+    for a in range(N_CELLS)
+]
+
+# Zobrist keys: one per chain and cell (both pieces of a chain share them),
+# one per opposing chain pair and move-order relation (0 unmoved/equal,
+# 1 white chain moved later, 2 black chain moved later) and one for black
+# to move. The seed is fixed so keys are stable between runs.
+_zobrist_random = random.Random(0xEC11F5E)
+ZOBRIST_PIECE = [
+    [_zobrist_random.getrandbits(64) for cell in range(N_CELLS)] for chain in range(12)
+]
+ZOBRIST_ORDER = [
+    [[_zobrist_random.getrandbits(64) for relation in range(3)] for b in range(5)]
+    for a in range(5)
+]
+ZOBRIST_SIDE = _zobrist_random.getrandbits(64)
+
+
+def segments_cross(seg1, seg2):
+    # Exact integer form of line_intersect on two segment ids
+    (Ax1, Ay1), (Ax2, Ay2) = CELLS[SEGMENTS[seg1][0]], CELLS[SEGMENTS[seg1][1]]
+    (Bx1, By1), (Bx2, By2) = CELLS[SEGMENTS[seg2][0]], CELLS[SEGMENTS[seg2][1]]
+    d = (By2 - By1) * (Ax2 - Ax1) - (Bx2 - Bx1) * (Ay2 - Ay1)
+    nA = (Bx2 - Bx1) * (Ay1 - By1) - (By2 - By1) * (Ax1 - Bx1)
+    nB = (Ax2 - Ax1) * (Ay1 - By1) - (Ay2 - Ay1) * (Ax1 - Bx1)
+    if d > 0:
+        return 0 <= nA <= d and 0 <= nB <= d
+    if d < 0:
+        return d <= nA <= 0 and d <= nB <= 0
+    return False
+
+
+# CROSSING[s] has bit t set when segments s and t intersect
+CROSSING = [
+    sum(1 << t for t in range(N_SEGMENTS) if segments_cross(s, t))
+    for s in range(N_SEGMENTS)
+]
+
+# BIG_BLOCKED[cell][s] has the big stone destinations from cell set whose step
+# crosses segment s, so the steps an enemy chain blocks are a single lookup
+BIG_BLOCKED = [
+    [
+        sum(
+            1 << dest
+            for dest, step in NEIGHBOUR_SEGMENTS[2][cell]
+            if CROSSING[step] >> s & 1
+        )
+        for s in range(N_SEGMENTS)
+    ]
+    for cell in range(N_CELLS)
+]
+
+
+def validate_crossing_table():
+    # Compare every pair of segments against the geometric line_intersect
+    mismatches = []
+    for s in range(N_SEGMENTS):
+        line1 = CELLS[SEGMENTS[s][0]], CELLS[SEGMENTS[s][1]]
+        for t in range(N_SEGMENTS):
+            line2 = CELLS[SEGMENTS[t][0]], CELLS[SEGMENTS[t][1]]
+            if bool(CROSSING[s] >> t & 1) != line_intersect(line1, line2):
+                mismatches.append((s, t))
+    return mismatches
+
+
+if __name__ == "__main__":
+
+    mismatches = validate_crossing_table()
+    print("Segments:", N_SEGMENTS)
+    print("Crossing pairs:", sum(bin(mask).count("1") for mask in CROSSING))
+    print("Mismatches against line_intersect:", len(mismatches))
+    sys.exit(1 if mismatches else 0)
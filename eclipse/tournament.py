@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from engine import Engine
+from mcts import MCTSEngine
+from record import GameWriter
+from state import GameState
+from tile import Tile
+
+# Games still running after this many plies are adjudicated by the
+# evaluation, a margin below ADJUDICATE_MARGIN counts as a draw
+MAX_GAME_PLIES = 200
+ADJUDICATE_MARGIN = 1.0
+
+# SPRT error rates
+SPRT_ALPHA = 0.05
+SPRT_BETA = 0.05
+
+
+def make_engine(config):
+    # A configuration is a dict of engine options, "engine" picks the kind
+    options = dict(config)
+    kind = options.pop("engine", "alphabeta")
+    if kind == "mcts":
+        return MCTSEngine(**options)
+    if kind == "alphabeta":
+        return Engine(**options)
+    raise ValueError("unknown engine: " + str(kind))
+
+
+def adjudicate(state):
+    value = state.utility_distance(Tile.P_WHITE, [1, 1, 0.1, 0.1])
+    if abs(value) < ADJUDICATE_MARGIN:
+        return 0
+    return Tile.P_WHITE if value > 0 else Tile.P_BLACK
+
+
+def play_game(engines, time_limit, state, max_plies=MAX_GAME_PLIES):
+    # engines[0] plays white and engines[1] black from state. Returns the
+    # winner (0 for a draw) and the moves played.
+    moves = []
+    winner = state.find_winner()
+    while not winner and state.total_plies < max_plies:
+        engine = engines[state.current_player - 1]
+        move, stats = engine.search(state, time_limit)
+        state.make_move(move)
+        moves.append(move)
+        winner = state.find_winner()
+    return winner or adjudicate(state), moves
+
+
+def random_opening(seed, plies):
+    # The same seed gives the same opening, so a pair of games can replay it
+    # with the colours swapped. An opening that already decides the game is
+    # drawn again, its games would not tell the engines apart.
+    rng = random.Random(seed)
+    while True:
+        state = GameState()
+        opening = []
+        for ply in range(plies):
+            if state.find_winner():
+                break
+            move = rng.choice(state.get_next_moves())
+            state.make_move(move)
+            opening.append(move)
+        if not state.find_winner():
+            return state, opening
+
+
+def run_game(index, configs, time_limit, opening_seed, opening_plies, max_plies):
+    # Game index plays configs[0] white on even and black on odd indices
+    state, opening = random_opening(opening_seed, opening_plies)
+    swap = index % 2
+    engines = [make_engine(configs[swap]), make_engine(configs[1 - swap])]
+    start = time.time()
+    winner, moves = play_game(engines, time_limit, state, max_plies)
+    for engine in engines:
+        engine.close()
+
+    # Score of the first configuration
+    if winner == 0:
+        score = 0.5
+    else:
+        score = 1.0 if (winner == Tile.P_WHITE) != bool(swap) else 0.0
+    return {
+        "game": index,
+        "white": configs[swap],
+        "black": configs[1 - swap],
+        "opening": opening,
+        "moves": opening + moves,
+        "winner": winner,
+        "score": score,
+        "time": time.time() - start,
+    }
+
+
+def elo_from_score(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400.0 * math.log10(1.0 / score - 1.0)
+
+
+def score_from_elo(elo):
+    return 1.0 / (1.0 + 10.0 ** (-elo / 400.0))
+
+
+def elo_summary(wins, draws, losses):
+    # Elo difference with a 95% interval and the likelihood of superiority
+    n = wins + draws + losses
+    if not n:
+        return 0.5, 0.0, (0.0, 0.0), 0.5
+    score = (wins + 0.5 * draws) / n
+    variance = (wins + 0.25 * draws) / n - score**2
+    margin = 1.96 * math.sqrt(variance / n)
+    elo = elo_from_score(score)
+    low, high = elo_from_score(score - margin), elo_from_score(score + margin)
+    decisive = wins + losses
+    los = 0.5
+    if decisive:
+        los = 0.5 * (1 + math.erf((wins - losses) / math.sqrt(2 * decisive)))
+    return score, elo, (low, high), los
+
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    # Log likelihood ratio of elo1 against elo0, normal approximation of the
+    # trinomial game results (the GSPRT of common test frameworks)
+    n = wins + draws + losses
+    if not n:
+        return 0.0
+    score = (wins + 0.5 * draws) / n
+    variance = ((wins + 0.25 * draws) / n - score**2) / n
+    if variance <= 0:
+        # All games had the same result, a pseudo win and loss give the
+        # variance a floor so that a sweep still ends the test
+        wins, losses, n = wins + 1, losses + 1, n + 2
+        score = (wins + 0.5 * draws) / n
+        variance = ((wins + 0.25 * draws) / n - score**2) / n
+    score0, score1 = score_from_elo(elo0), score_from_elo(elo1)
+    return (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+
+def sprt_bounds(alpha=SPRT_ALPHA, beta=SPRT_BETA):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def run_tournament(
+    configs,
+    games,
+    time_limit,
+    workers=None,
+    opening_plies=8,
+    max_plies=MAX_GAME_PLIES,
+    seed=0,
+    sprt=None,
+    games_file=None,
+    record_file=None,
+    verbose=True,
+):
+    # Plays games between configs[0] and configs[1] in a process pool, in
+    # pairs from the same opening with the colours swapped. With sprt given
+    # as (elo0, elo1) the match stops once the test accepts a hypothesis.
+    workers = workers or os.cpu_count() or 1
+    rng = random.Random(seed)
+    seeds = [rng.getrandbits(32) for pair in range((games + 1) // 2)]
+    lower, upper = sprt_bounds()
+    results = {"wins": 0, "draws": 0, "losses": 0, "llr": 0.0, "sprt": None}
+
+    out = open(games_file, "a") if games_file else None
+    record = GameWriter(record_file) if record_file else None
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        pending = {
+            pool.submit(
+                run_game,
+                index,
+                configs,
+                time_limit,
+                seeds[index // 2],
+                opening_plies,
+                max_plies,
+            )
+            for index in range(games)
+        }
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                game = future.result()
+                if out is not None:
+                    out.write(json.dumps(game) + "\n")
+                    out.flush()
+                if record is not None:
+                    record.write_game(game["moves"], game["winner"])
+                if game["score"] == 1.0:
+                    results["wins"] += 1
+                elif game["score"] == 0.0:
+                    results["losses"] += 1
+                else:
+                    results["draws"] += 1
+
+            played = results["wins"] + results["draws"] + results["losses"]
+            if sprt is not None:
+                results["llr"] = sprt_llr(
+                    results["wins"], results["draws"], results["losses"], *sprt
+                )
+                if results["llr"] >= upper:
+                    results["sprt"] = "H1"
+                elif results["llr"] <= lower:
+                    results["sprt"] = "H0"
+            if verbose:
+                print(
+                    "Games",
+                    played,
+                    "- W",
+                    results["wins"],
+                    "D",
+                    results["draws"],
+                    "L",
+                    results["losses"],
+                    ("LLR " + str(round(results["llr"], 2))) if sprt else "",
+                )
+            if results["sprt"] is not None:
+                for future in pending:
+                    future.cancel()
+                pending = set()
+    if out is not None:
+        out.close()
+    if record is not None:
+        record.close()
+    return results
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Play two engine configurations against each other."
+    )
+    parser.add_argument("games", type=int)
+    parser.add_argument("t_limit", type=float, help="seconds per move")
+    parser.add_argument("config_a", nargs="?", default="{}", help="JSON options")
+    parser.add_argument("config_b", nargs="?", default="{}", help="JSON options")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--openings", type=int, default=8, help="random plies")
+    parser.add_argument("--max-plies", type=int, default=MAX_GAME_PLIES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sprt", type=float, nargs=2, metavar=("ELO0", "ELO1"))
+    parser.add_argument("--games-file", help="append played games as JSON lines")
+    parser.add_argument("--record", help="append played games to a game record")
+    args = parser.parse_args()
+
+    try:
+        configs = [json.loads(args.config_a), json.loads(args.config_b)]
+    except ValueError as error:
+        print("error: configurations should be JSON objects:", error)
+        sys.exit(-1)
+
+    results = run_tournament(
+        configs,
+        args.games,
+        args.t_limit,
+        workers=args.workers,
+        opening_plies=args.openings,
+        max_plies=args.max_plies,
+        seed=args.seed,
+        sprt=args.sprt,
+        games_file=args.games_file,
+        record_file=args.record,
+    )
+
+    wins, draws, losses = results["wins"], results["draws"], results["losses"]
+    score, elo, (low, high), los = elo_summary(wins, draws, losses)
+    print()
+    print("Tournament Results")
+    print("==================")
+    print("A:", args.config_a)
+    print("B:", args.config_b)
+    print("Games:", wins + draws + losses, "- W", wins, "D", draws, "L", losses)
+    print("Score:", str(round(100 * score, 1)) + "%")
+    print("Elo:", round(elo, 1), "[" + str(round(low, 1)), str(round(high, 1)) + "]")
+    print("LOS:", str(round(100 * los, 1)) + "%")
+    if args.sprt:
+        lower, upper = sprt_bounds()
+        print(
+            "SPRT:",
+            "LLR",
+            round(results["llr"], 2),
+            "[" + str(round(lower, 2)),
+            str(round(upper, 2)) + "]",
+            results["sprt"] or "inconclusive",
+        )
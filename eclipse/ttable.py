@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+from array import array
+from multiprocessing import shared_memory
+
+# Bound types
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# An entry is two 64-bit words, the key xor-ed with the data and the data:
+#   bits  0-11  move + 1 (0 when there is no move)
+#   bits 12-18  depth
+#   bits 19-20  bound type
+#   bits 21-26  search generation
+#   bits 27-63  score in 1/65536 steps, offset to stay positive
+ENTRY_BYTES = 16
+SCORE_SCALE = 1 << 16
+SCORE_OFFSET = 1 << 36
+MAX_DEPTH = 127
+GENERATIONS = 64
+
+
+def pack_entry(move, depth, bound, generation, score):
+    score = max(-SCORE_OFFSET, min(SCORE_OFFSET - 1, int(round(score * SCORE_SCALE))))
+    return (
+        (move + 1 if move is not None else 0)
+        | min(depth, MAX_DEPTH) << 12
+        | bound << 19
+        | generation << 21
+        | score + SCORE_OFFSET << 27
+    )
+
+
+def unpack_entry(data):
+    move = (data & 0xFFF) - 1
+    return (
+        move if move >= 0 else None,
+        data >> 12 & 0x7F,
+        data >> 19 & 0x3,
+        ((data >> 27) - SCORE_OFFSET) / SCORE_SCALE,
+    )
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16):
+
+        # Buckets of two entries: the first keeps the deepest result, the
+        # second always takes the newest one
+        entries = max(2, (int(size_mb * (1 << 20)) // ENTRY_BYTES))
+        self.buckets = 1 << (entries // 2).bit_length() - 1
+        self.size_mb = size_mb
+        self.words = self.allocate(self.buckets * 4)
+        self.generation = 0
+
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def allocate(self, n_words):
+        return array("Q", bytes(8 * n_words))
+
+    def new_search(self):
+        # Entries from earlier searches lose their claim on the deep slot
+        self.generation = (self.generation + 1) % GENERATIONS
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def clear(self):
+        self.words = self.allocate(self.buckets * 4)
+
+    def probe(self, key):
+        # Returns (move, depth, bound, score) or None
+        self.probes += 1
+        words = self.words
+        index = (key & (self.buckets - 1)) << 2
+        for i in (index, index + 2):
+            data = words[i + 1]
+            if words[i] ^ data == key and data:
+                self.hits += 1
+                return unpack_entry(data)
+        return None
+
+    def store(self, key, move, depth, bound, score):
+        self.stores += 1
+        words = self.words
+        index = (key & (self.buckets - 1)) << 2
+        data = pack_entry(move, depth, bound, self.generation, score)
+
+        # Keep the deep slot for the same position, a deeper result or a
+        # stale generation, otherwise fall back to the always-replace slot
+        old = words[index + 1]
+        if (
+            words[index] ^ old == key
+            or not old
+            or depth >= (old >> 12 & 0x7F)
+            or (old >> 21 & 0x3F) != self.generation
+        ):
+            if move is None and words[index] ^ old == key:
+                data |= old & 0xFFF
+            words[index] = key ^ data
+            words[index + 1] = data
+        else:
+            words[index + 2] = key ^ data
+            words[index + 3] = data
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+
+class SharedTranspositionTable(TranspositionTable):
+    def __init__(self, size_mb=16, name=None):
+
+        # The table lives in a shared memory block, other processes attach to
+        # it by name. Entries are never locked: a torn write leaves a key that
+        # no longer matches its data and the probe simply misses.
+        self.name = name
+        self.shm = None
+        TranspositionTable.__init__(self, size_mb)
+
+    def allocate(self, n_words):
+        if self.name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=8 * n_words)
+            self.name = self.shm.name
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=self.name)
+            self.owner = False
+        return self.shm.buf[: 8 * n_words].cast("Q")
+
+    def clear(self):
+        self.shm.buf[: 8 * len(self.words)] = bytes(8 * len(self.words))
+
+    def close(self):
+        # Only the creating process removes the block
+        if self.shm is not None:
+            self.words.release()
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+            self.shm = None
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+import argparse
+import math
+import os
+import sys
+
+import numpy as np
+
+from batch import distance_features
+from record import read_game_files
+from state import GameState
+from tile import Tile
+from weights import DEFAULT_WEIGHTS, load_weights, write_weights
+
+# Positions are turned into features this many at a time
+CHUNK_SIZE = 65536
+
+# A feature record is the nearest six and the all pieces term of the
+# evaluation of white, each the own big stone's term minus the enemy's, and
+# the result of the game for white. The weights of both sides are tied, so
+# the evaluation of black is the negated one of white as the search expects.
+RECORD_SIZE = 3
+
+# Bounds of the sigmoid scale, a fit that ends on one does not tell wins
+# from losses and its weights are not written
+SCALE_BOUNDS = (1e-3, 10.0)
+
+
+def tie(constants):
+    # Evaluation constants -> (nearest six weight, all pieces weight)
+    return np.array(
+        [(constants[0] + constants[1]) / 2, (constants[2] + constants[3]) / 2]
+    )
+
+
+def untie(weights):
+    return [float(weights[0]), float(weights[0]), float(weights[1]), float(weights[1])]
+
+
+def game_positions(game, skip_plies=None):
+    # (piece cells, result for white) of every position of a game after its
+    # random opening (or skip_plies), up to the last one before the end.
+    # Unfinished games have no result.
+    if game["winner"] is None:
+        return
+    if game["winner"] == Tile.P_WHITE:
+        result = 1.0
+    elif game["winner"] == Tile.P_BLACK:
+        result = 0.0
+    else:
+        result = 0.5
+    if skip_plies is None:
+        skip_plies = len(game.get("opening", []))
+
+    state = GameState(down=game.get("down", Tile.P_WHITE))
+    for ply, move in enumerate(game["moves"]):
+        if ply >= skip_plies:
+            yield list(state.pos), result
+        state.make_move(move)
+
+
+def extract_features(paths, out_path, skip_plies=None, chunk_size=CHUNK_SIZE):
+    # Streams the games into a flat file of float64 feature records, a chunk
+    # of positions at a time, and returns the number of records
+    count = 0
+    rows, results = [], []
+    with open(out_path, "wb") as out:
+
+        def flush():
+            features = distance_features(np.array(rows, dtype=np.intp), Tile.P_WHITE)
+            records = np.empty((len(rows), RECORD_SIZE))
+            records[:, 0] = features[:, 0] - features[:, 1]
+            records[:, 1] = features[:, 2] - features[:, 3]
+            records[:, 2] = results
+            records.tofile(out)
+            rows.clear()
+            results.clear()
+
+        for game in read_game_files(paths):
+            for pos, result in game_positions(game, skip_plies):
+                rows.append(pos)
+                results.append(result)
+                count += 1
+                if len(rows) == chunk_size:
+                    flush()
+        if rows:
+            flush()
+    return count
+
+
+def open_features(path):
+    # Maps the records in place, the fit reads them a chunk at a time
+    records = np.memmap(path, dtype=np.float64, mode="r")
+    return records.reshape(-1, RECORD_SIZE)
+
+
+def sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def mean_error(records, weights, scale, chunk_size=CHUNK_SIZE):
+    # Mean squared error between the results and the win probabilities the
+    # evaluation predicts
+    total = 0.0
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start : start + chunk_size]
+        predicted = sigmoid(scale * (chunk[:, :2] @ weights))
+        total += np.sum((chunk[:, 2] - predicted) ** 2)
+    return total / len(records)
+
+
+def fit_scale(records, weights, bounds=SCALE_BOUNDS, iterations=40):
+    # Golden section search for the scale of the sigmoid that fits the
+    # current weights best, the weights are then tuned with it fixed so that
+    # they stay comparable to the hand picked ones
+    ratio = (math.sqrt(5) - 1) / 2
+    a, b = math.log(bounds[0]), math.log(bounds[1])
+    c, d = b - ratio * (b - a), a + ratio * (b - a)
+    error_c = mean_error(records, weights, math.exp(c))
+    error_d = mean_error(records, weights, math.exp(d))
+    for i in range(iterations):
+        if error_c < error_d:
+            b, d, error_d = d, c, error_c
+            c = b - ratio * (b - a)
+            error_c = mean_error(records, weights, math.exp(c))
+        else:
+            a, c, error_c = c, d, error_d
+            d = a + ratio * (b - a)
+            error_d = mean_error(records, weights, math.exp(d))
+    return math.exp((a + b) / 2)
+
+
+def scale_at_bound(scale, bounds=SCALE_BOUNDS):
+    return scale < 1.01 * bounds[0] or scale > bounds[1] / 1.01
+
+
+def normal_equations(records, weights, scale, chunk_size=CHUNK_SIZE):
+    # Gauss-Newton terms J^T J and J^T r of the squared error, summed over
+    # chunks, and the mean error at weights
+    jtj = np.zeros((2, 2))
+    jtr = np.zeros(2)
+    total = 0.0
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start : start + chunk_size]
+        features = chunk[:, :2]
+        predicted = sigmoid(scale * (features @ weights))
+        residual = chunk[:, 2] - predicted
+        jacobian = features * (scale * predicted * (1 - predicted))[:, None]
+        jtj += jacobian.T @ jacobian
+        jtr += jacobian.T @ residual
+        total += np.sum(residual**2)
+    return jtj, jtr, total / len(records)
+
+
+def fit_weights(records, constants, scale, iterations=20, verbose=True):
+    # Levenberg-Marquardt on the tied weights, one pass over the records a
+    # step. Returns the evaluation constants and their mean error.
+    weights = tie(constants)
+    damping = 1e-3
+    jtj, jtr, error = normal_equations(records, weights, scale)
+    for i in range(iterations):
+        step = np.linalg.solve(jtj + damping * np.diag(np.diag(jtj) + 1e-12), jtr)
+        trial = weights + step
+        trial_jtj, trial_jtr, trial_error = normal_equations(records, trial, scale)
+        if trial_error < error:
+            weights, jtj, jtr = trial, trial_jtj, trial_jtr
+            converged = error - trial_error < 1e-9
+            error = trial_error
+            damping /= 10
+            if verbose:
+                print("step", i + 1, "error", round(error, 6), np.round(weights, 4))
+            if converged:
+                break
+        else:
+            damping *= 10
+    return untie(weights), error
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Tune the evaluation weights on the results of recorded games."
+    )
+    parser.add_argument("games", nargs="+", help="game records or JSON lines")
+    parser.add_argument("--out", default=DEFAULT_WEIGHTS, help="weights file")
+    parser.add_argument("--features", help="feature file, kept when given")
+    parser.add_argument("--skip-plies", type=int, help="default: random opening")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--force", action="store_true", help="write any weights")
+    args = parser.parse_args()
+
+    features_path = args.features or args.out + ".features"
+    try:
+        count = extract_features(args.games, features_path, args.skip_plies)
+        if not count:
+            print("error: no positions in", " ".join(args.games))
+            sys.exit(-1)
+        records = open_features(features_path)
+
+        constants = load_weights(args.out) or [1, 1, 0.1, 0.1]
+        scale = fit_scale(records, tie(constants))
+        start_error = mean_error(records, tie(constants), scale)
+        print(
+            count, "positions, scale", round(scale, 4), "error", round(start_error, 6)
+        )
+        if scale_at_bound(scale):
+            print(
+                "error: the evaluation does not predict these results (scale at bound)"
+            )
+            sys.exit(-1)
+        constants, error = fit_weights(records, constants, scale, args.iterations)
+
+        # The search margins are sized for positive weights
+        if min(constants) <= 0 and not args.force:
+            print("error: tuned weights", constants, "are not positive, use --force")
+            sys.exit(-1)
+
+        write_weights(args.out, constants, scale, count, error)
+        print("Wrote", [round(constant, 4) for constant in constants], "to", args.out)
+    finally:
+        # The feature file is only kept when asked for, also after an error,
+        # the map is released first
+        records = None
+        if not args.features and os.path.exists(features_path):
+            os.remove(features_path)
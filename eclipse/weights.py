@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+DEFAULT_WEIGHTS = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "weights.json"
+)
+
+
+def load_weights(path):
+    # The weights are optional, a missing file means the built in constants.
+    # The search negates scores between the sides, so the terms of both big
+    # stones have to weigh the same.
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as file:
+        constants = [float(constant) for constant in json.load(file)["constants"]]
+    if len(constants) != 4:
+        raise ValueError("expected four weights in " + str(path))
+    if constants[0] != constants[1] or constants[2] != constants[3]:
+        raise ValueError("weights of both sides differ in " + str(path))
+    return constants
+
+
+def write_weights(path, constants, scale, positions, error):
+    # The file is replaced in one step so engines never read half of it
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as file:
+        json.dump(
+            {
+                "constants": [float(constant) for constant in constants],
+                "scale": scale,
+                "positions": positions,
+                "error": error,
+            },
+            file,
+            indent=2,
+        )
+        file.write("\n")
+    os.replace(temp_path, path)